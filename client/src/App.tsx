@@ -10,6 +10,7 @@ import {
   PatientFormData 
 } from './types'
 import { api } from './utils/api'
+import { formatConfidence, getPredictionLabel } from './utils/prediction'
 
 function App() {
   const [isLoggedIn, setIsLoggedIn] = useState(false);
@@ -158,7 +159,7 @@ function App() {
   };
 
   const handleViewPatient = (patient: Patient) => {
-    alert(`Viewing patient: ${patient.name}\nRisk: ${patient.lung_cancer ? 'High' : 'Low'}\nConfidence: ${(patient.prediction_confidence * 100).toFixed(1)}%`);
+    alert(`Viewing patient: ${patient.name}\nRisk: ${getPredictionLabel(patient)}\nConfidence: ${formatConfidence(patient)}`);
   };
 
   const handleEditPatient = (patient: Patient) => {
@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { formatConfidence, getPredictionLabel } from '../utils/prediction';
 
 interface PatientEditFormProps {
   patient: any;
@@ -155,10 +156,10 @@ const PatientEditForm: React.FC<PatientEditFormProps> = ({
       }}>
         <h3 style={{ margin: '0 0 0.5rem 0', color: '#495057' }}>Current Risk Assessment</h3>
         <p style={{ margin: '0 0 0.25rem 0', fontSize: '0.9rem' }}>
-          <strong>Prediction:</strong> {patient.lung_cancer ? 'High Risk' : 'Low Risk'}
+          <strong>Prediction:</strong> {getPredictionLabel(patient)}
         </p>
         <p style={{ margin: 0, fontSize: '0.9rem' }}>
-          <strong>Confidence:</strong> {(patient.prediction_confidence * 100).toFixed(1)}%
+          <strong>Confidence:</strong> {formatConfidence(patient)}
         </p>
         <p style={{ margin: '0.5rem 0 0 0', fontSize: '0.8rem', color: '#6c757d' }}>
           <em>Note: Risk assessment will be recalculated when you save changes</em>
@@ -1,4 +1,5 @@
 import React from 'react';
+import { formatConfidence, getPredictionLabel, isScored } from '../utils/prediction';
 
 interface Patient {
   id: number;
@@ -18,8 +19,9 @@ interface Patient {
   shortness_of_breath: boolean;
   swallowing_difficulty: boolean;
   chest_pain: boolean;
-  lung_cancer: boolean;
-  prediction_confidence: number;
+  lung_cancer: boolean | null;
+  prediction_confidence: number | null;
+  prediction_status?: 'pending' | 'done' | 'failed';
   created_at: string;
 }
 
@@ -42,15 +44,23 @@ const PatientList: React.FC<PatientListProps> = ({
     return new Date(dateString).toLocaleDateString();
   };
 
-  const getRiskColor = (lungCancer: boolean, confidence: number) => {
-    if (lungCancer) {
+  const getRiskColor = (patient: Patient) => {
+    if (!isScored(patient)) {
+      return '#6c757d'; // Grey while pending or after a failed scoring
+    }
+    const confidence = patient.prediction_confidence ?? 0;
+    if (patient.lung_cancer) {
       return confidence > 0.8 ? '#dc3545' : '#fd7e14'; // Red for high risk, orange for medium
     }
     return confidence > 0.8 ? '#28a745' : '#ffc107'; // Green for low risk, yellow for uncertain
   };
 
-  const getRiskLabel = (lungCancer: boolean, confidence: number) => {
-    if (lungCancer) {
+  const getRiskLabel = (patient: Patient) => {
+    if (!isScored(patient)) {
+      return getPredictionLabel(patient);
+    }
+    const confidence = patient.prediction_confidence ?? 0;
+    if (patient.lung_cancer) {
       return confidence > 0.8 ? 'High Risk' : 'Medium Risk';
     }
     return confidence > 0.8 ? 'Low Risk' : 'Uncertain';
@@ -111,14 +121,14 @@ const PatientList: React.FC<PatientListProps> = ({
               </div>
               
               <div style={{
-                backgroundColor: getRiskColor(patient.lung_cancer, patient.prediction_confidence),
+                backgroundColor: getRiskColor(patient),
                 color: 'white',
                 padding: '0.25rem 0.75rem',
                 borderRadius: '20px',
                 fontSize: '0.8rem',
                 fontWeight: 'bold'
               }}>
-                {getRiskLabel(patient.lung_cancer, patient.prediction_confidence)}
+                {getRiskLabel(patient)}
               </div>
             </div>
 
@@ -131,10 +141,10 @@ const PatientList: React.FC<PatientListProps> = ({
             }}>
               <h4 style={{ margin: '0 0 0.5rem 0', color: '#495057' }}>Risk Assessment</h4>
               <p style={{ margin: '0 0 0.25rem 0', fontSize: '0.9rem' }}>
-                <strong>Prediction:</strong> {patient.lung_cancer ? 'High Risk' : 'Low Risk'}
+                <strong>Prediction:</strong> {getPredictionLabel(patient)}
               </p>
               <p style={{ margin: 0, fontSize: '0.9rem' }}>
-                <strong>Confidence:</strong> {(patient.prediction_confidence * 100).toFixed(1)}%
+                <strong>Confidence:</strong> {formatConfidence(patient)}
               </p>
             </div>
 
@@ -42,9 +42,12 @@ export interface Patient {
   shortness_of_breath: boolean;
   swallowing_difficulty: boolean;
   chest_pain: boolean;
-  lung_cancer: boolean;
-  prediction_confidence: number;
+  // null until scored when deferred scoring is enabled
+  lung_cancer: boolean | null;
+  prediction_confidence: number | null;
+  prediction_status?: 'pending' | 'done' | 'failed';
   created_at: string;
+  updated_at?: string;
 }
 
 // Form Types (for creating/updating patients)
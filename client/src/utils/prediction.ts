@@ -0,0 +1,32 @@
+// Risk prediction display helpers
+//
+// With deferred scoring the server stores patients before they are scored:
+// lung_cancer and prediction_confidence are null (or still hold the previous
+// score after an update) until prediction_status is 'done'.
+
+export interface PredictionFields {
+  lung_cancer: boolean | null;
+  prediction_confidence: number | null;
+  prediction_status?: 'pending' | 'done' | 'failed';
+}
+
+export const isScored = (patient: PredictionFields): boolean => {
+  return (patient.prediction_status ?? 'done') === 'done' && patient.lung_cancer !== null;
+};
+
+export const getPredictionLabel = (patient: PredictionFields): string => {
+  if (patient.prediction_status === 'pending') {
+    return 'Pending';
+  }
+  if (patient.prediction_status === 'failed' || !isScored(patient)) {
+    return 'Failed';
+  }
+  return patient.lung_cancer ? 'High Risk' : 'Low Risk';
+};
+
+export const formatConfidence = (patient: PredictionFields): string => {
+  if (!isScored(patient) || patient.prediction_confidence === null) {
+    return '—';
+  }
+  return `${(patient.prediction_confidence * 100).toFixed(1)}%`;
+};
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the prediction micro-batcher
+
+Compares single-row scoring against the PredictionBatcher at several
+concurrency levels and prints throughput and p50/p99 latency.
+
+Run from the repository root (the model path is relative to it):
+    python server/benchmarks/bench_batcher.py [--requests 2000] [--concurrency 1 8 32 64]
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np
+from ml.predict import predict_batch
+from ml.batcher import PredictionBatcher
+
+SYMPTOMS = [
+    "biological_gender", "smoking", "yellow_fingers", "anxiety", "peer_pressure",
+    "chronic_disease", "fatigue", "allergy", "wheezing", "alcohol", "coughing",
+    "shortness_of_breath", "swallowing_difficulty", "chest_pain"
+]
+
+def random_patient(rng: random.Random) -> dict:
+    """Generate a random patient feature row"""
+    patient = {symptom: rng.random() < 0.5 for symptom in SYMPTOMS}
+    patient["age"] = rng.randint(21, 87)
+    return patient
+
+def run(score, patients: list[dict], concurrency: int) -> tuple[float, np.ndarray]:
+    """Score all patients with ``concurrency`` client threads; returns (seconds, latencies)"""
+    latencies = np.empty(len(patients))
+
+    def call(i):
+        start = time.perf_counter()
+        score(patients[i])
+        latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(len(patients))))
+    return time.perf_counter() - start, latencies
+
+def report(label: str, concurrency: int, elapsed: float, latencies: np.ndarray):
+    p50, p99 = np.percentile(latencies * 1000, [50, 99])
+    print(f"{label:<10} {concurrency:>11} {len(latencies) / elapsed:>12.0f} {p50:>10.2f} {p99:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the prediction batcher")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = random.Random(420)
+    patients = [random_patient(rng) for _ in range(args.requests)]
+
+    # Warm up lazy sklearn code paths
+    predict_batch(patients[:64])
+
+    print(f"{'mode':<10} {'concurrency':>11} {'req/s':>12} {'p50 ms':>10} {'p99 ms':>10}")
+    for concurrency in args.concurrency:
+        elapsed, latencies = run(lambda p: predict_batch([p])[0], patients, concurrency)
+        report("single", concurrency, elapsed, latencies)
+
+        batcher = PredictionBatcher(
+            max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms
+        )
+        batcher.start()
+        elapsed, latencies = run(batcher.predict, patients, concurrency)
+        batcher.stop()
+        report("batched", concurrency, elapsed, latencies)
+
+if __name__ == "__main__":
+    main()
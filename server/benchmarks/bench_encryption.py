@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark for patient name encryption formats
+
+Compares the legacy base64(Fernet) text format with the compact binary
+AES-GCM format: stored bytes per name and encrypt/decrypt CPU per row.
+
+    python server/benchmarks/bench_encryption.py [--rows 20000]
+"""
+
+import sys
+import os
+import time
+import random
+import string
+import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from encryption import encrypt_text, decrypt_text, encrypt_bytes, decrypt_bytes, get_keyring, get_encryption_key
+
+def random_name(rng: random.Random) -> str:
+    first = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))).title()
+    last = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12))).title()
+    return f"{first} {last}"
+
+def measure(encrypt, decrypt, names: list[str]) -> tuple[float, float, float]:
+    """Returns (average stored bytes, encrypt µs/row, decrypt µs/row)"""
+    start = time.perf_counter()
+    ciphertexts = [encrypt(name) for name in names]
+    encrypt_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for ciphertext in ciphertexts:
+        decrypt(ciphertext)
+    decrypt_time = time.perf_counter() - start
+
+    size = sum(len(c.encode() if isinstance(c, str) else c) for c in ciphertexts) / len(names)
+    return size, encrypt_time / len(names) * 1e6, decrypt_time / len(names) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark name encryption formats")
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(420)
+    names = [random_name(rng) for _ in range(args.rows)]
+    plain = sum(len(name.encode()) for name in names) / len(names)
+
+    # Derive keys up front so PBKDF2 is not part of the per-row numbers
+    get_encryption_key()
+    get_keyring()
+
+    print(f"{args.rows} names, {plain:.1f} plaintext bytes on average\n")
+    print(f"{'format':<22} {'bytes/row':>10} {'encrypt µs':>11} {'decrypt µs':>11}")
+    for label, encrypt, decrypt in [
+        ("base64(Fernet) text", encrypt_text, decrypt_text),
+        ("AES-GCM binary", encrypt_bytes, decrypt_bytes),
+    ]:
+        size, encrypt_us, decrypt_us = measure(encrypt, decrypt, names)
+        print(f"{label:<22} {size:>10.1f} {encrypt_us:>11.2f} {decrypt_us:>11.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark for hash-partitioning patient_data by doctor_id (PostgreSQL)
+
+Builds a plain table and a hash-partitioned table with the patient_data
+layout in a scratch schema, grows both step by step with the same synthetic
+rows (a fixed number of patients per doctor, so per-doctor data stays the
+same size while the total grows) and measures the per-doctor queries the
+API runs: the patient list, the collection ETag aggregate and a single
+patient lookup. The scratch schema is dropped at the end.
+
+    python server/benchmarks/bench_partitioning.py --sizes 1000000,10000000,30000000 [--partitions 32]
+
+Loading tens of millions of rows takes a while and several GB of disk.
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from sqlalchemy import create_engine, text
+from config import settings
+
+SCHEMA = "bench_partitioning"
+
+COLUMNS = """
+    id BIGINT NOT NULL,
+    doctor_id INTEGER NOT NULL,
+    name_ciphertext BYTEA,
+    age INTEGER,
+    smoking BOOLEAN,
+    coughing BOOLEAN,
+    chest_pain BOOLEAN,
+    lung_cancer BOOLEAN,
+    prediction_confidence FLOAT,
+    prediction_status VARCHAR(16) NOT NULL DEFAULT 'done',
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    version INTEGER NOT NULL DEFAULT 1
+"""
+
+QUERIES = {
+    "list": "SELECT id, name_ciphertext, age, lung_cancer, prediction_confidence FROM {table} WHERE doctor_id = :doctor_id",
+    "etag": "SELECT count(id), max(updated_at), coalesce(sum(version), 0) FROM {table} WHERE doctor_id = :doctor_id",
+    "get": "SELECT * FROM {table} WHERE id = :patient_id AND doctor_id = :doctor_id",
+}
+
+def create_tables(conn, partitions: int):
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.plain ({COLUMNS}, PRIMARY KEY (id))"))
+    conn.execute(text(f"CREATE INDEX ON {SCHEMA}.plain (doctor_id)"))
+
+    conn.execute(text(
+        f"CREATE TABLE {SCHEMA}.partitioned ({COLUMNS}, PRIMARY KEY (id, doctor_id)) PARTITION BY HASH (doctor_id)"
+    ))
+    conn.execute(text(f"CREATE INDEX ON {SCHEMA}.partitioned (doctor_id)"))
+    for remainder in range(partitions):
+        conn.execute(text(
+            f"CREATE TABLE {SCHEMA}.partitioned_p{remainder} PARTITION OF {SCHEMA}.partitioned "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        ))
+
+def grow(conn, start: int, stop: int, patients_per_doctor: int):
+    """Insert rows with ids in [start, stop) into both tables"""
+    for table in ("plain", "partitioned"):
+        conn.execute(text(f"""
+            INSERT INTO {SCHEMA}.{table}
+                (id, doctor_id, name_ciphertext, age, smoking, coughing, chest_pain,
+                 lung_cancer, prediction_confidence, created_at, updated_at)
+            SELECT
+                g, g / {patients_per_doctor}, decode(md5(g::text), 'hex'), 30 + g % 55,
+                g % 2 = 0, g % 3 = 0, g % 5 = 0, g % 7 <> 0, 0.5 + (g % 50) / 100.0,
+                now(), now()
+            FROM generate_series(:start, :stop - 1) AS g
+        """), {"start": start, "stop": stop})
+        conn.execute(text(f"ANALYZE {SCHEMA}.{table}"))
+
+def measure(conn, table: str, query: str, rows: int, patients_per_doctor: int,
+            repeats: int, rng: random.Random) -> tuple[float, float]:
+    """Returns (p50 ms, p95 ms) over random doctors"""
+    statement = text(QUERIES[query].format(table=f"{SCHEMA}.{table}"))
+    doctors = rows // patients_per_doctor
+    timings = []
+    for _ in range(repeats):
+        doctor_id = rng.randrange(doctors)
+        patient_id = doctor_id * patients_per_doctor + rng.randrange(patients_per_doctor)
+        start = time.perf_counter()
+        conn.execute(statement, {"doctor_id": doctor_id, "patient_id": patient_id}).fetchall()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000
+
+def table_size(conn, table: str) -> float:
+    """Size of the largest heap plus its indexes, in MB (a plain table or one partition)"""
+    size = conn.execute(text(f"""
+        SELECT max(pg_total_relation_size(c.oid))
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relkind = 'r' AND (c.relname = :table OR c.relname LIKE :partitions)
+    """), {"schema": SCHEMA, "table": table, "partitions": f"{table}_p%"}).scalar()
+    return (size or 0) / 1024 / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-doctor queries on plain vs partitioned patient_data")
+    parser.add_argument("--url", default=settings.DATABASE_URL, help="PostgreSQL URL (default: DATABASE_URL)")
+    parser.add_argument("--sizes", default="100000,1000000,10000000", help="Comma-separated total row counts")
+    parser.add_argument("--partitions", type=int, default=32)
+    parser.add_argument("--patients-per-doctor", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=500)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    if engine.dialect.name != "postgresql":
+        print("❌ Partitioning needs PostgreSQL")
+        sys.exit(1)
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    rng = random.Random(420)
+
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        create_tables(conn, args.partitions)
+        print(f"{args.partitions} partitions, {args.patients_per_doctor} patients per doctor\n")
+        print(f"{'rows':>11} {'table':<12} {'MB/heap':>8} "
+              + " ".join(f"{query + ' p50':>9} {query + ' p95':>9}" for query in QUERIES))
+
+        loaded = 0
+        try:
+            for size in sizes:
+                started = time.perf_counter()
+                grow(conn, loaded, size, args.patients_per_doctor)
+                loaded = size
+                print(f"   (loaded {size:,} rows in {time.perf_counter() - started:.0f}s)")
+
+                for table in ("plain", "partitioned"):
+                    line = f"{size:>11,} {table:<12} {table_size(conn, table):>8.1f} "
+                    for query in QUERIES:
+                        p50, p95 = measure(conn, table, query, size, args.patients_per_doctor, args.repeats, rng)
+                        line += f"{p50:>9.3f} {p95:>9.3f} "
+                    print(line)
+        finally:
+            if not args.keep:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark for patient list payloads
+
+Serializes a synthetic patient list with different fieldsets and measures
+per-list serialization time (including name decryption), JSON size and the
+size and cost of gzip and, if installed, brotli compression.
+
+    python server/benchmarks/bench_payload.py [--rows 500]
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from encryption import encrypt_bytes, get_keyring
+from projection import PATIENT_FIELDS, parse_fields, serialize_patient
+from compression import compress, brotli
+from ml.predict import FEATURE_FIELDS
+
+FIELDSETS = {
+    "all fields": None,
+    "list view": "name,lung_cancer,prediction_confidence,updated_at",
+    "risk only": "lung_cancer,prediction_confidence",
+}
+
+def synthetic_rows(count: int, rng: random.Random) -> list:
+    created = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        row = {field: rng.random() < 0.5 for field in FEATURE_FIELDS}
+        row.update({
+            "id": i + 1,
+            "version": 1,
+            "name_ciphertext": encrypt_bytes(f"Patient {rng.randint(1000, 9999)} {i}"),
+            "name_encrypted": None,
+            "age": rng.randint(30, 85),
+            "lung_cancer": rng.random() < 0.8,
+            "prediction_confidence": rng.uniform(0.5, 1.0),
+            "prediction_status": "done",
+            "doctor_id": 1,
+            "created_at": created + timedelta(minutes=i),
+            "updated_at": created + timedelta(minutes=i, seconds=30),
+        })
+        rows.append(SimpleNamespace(**row))
+    return rows
+
+def timed(fn, repeats: int) -> tuple[float, object]:
+    """Returns (median ms per call, last result)"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark patient list payloads")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    get_keyring()
+    rows = synthetic_rows(args.rows, random.Random(420))
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+
+    print(f"{args.rows} patients, {len(PATIENT_FIELDS)} fields in the full representation\n")
+    header = f"{'fieldset':<12} {'serialize ms':>13} {'JSON KB':>8}"
+    for encoding in encodings:
+        header += f" {encoding + ' KB':>8} {encoding + ' ms':>8}"
+    print(header)
+
+    for label, fields in FIELDSETS.items():
+        selected = parse_fields(fields)
+        serialize_ms, body = timed(
+            lambda: json.dumps([serialize_patient(row, selected) for row in rows]).encode(), args.repeats
+        )
+        line = f"{label:<12} {serialize_ms:>13.2f} {len(body) / 1024:>8.1f}"
+        for encoding in encodings:
+            compress_ms, compressed = timed(lambda: compress(body, encoding), args.repeats)
+            line += f" {len(compressed) / 1024:>8.1f} {compress_ms:>8.2f}"
+        print(line)
+
+    if brotli is None:
+        print("\nbrotli is not installed, only gzip was measured (pip install brotli)")
+
+if __name__ == "__main__":
+    main()
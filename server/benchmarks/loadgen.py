@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+End-to-end load generator for the MECHA-LUNG API
+
+Provisions synthetic doctors with the batch ``add_doctors`` machinery, logs
+them in and drives a weighted mix of login, create, list, get, update and
+delete requests against a running server. Patient payloads are sampled
+from the rows of ``data/lung_cancer.csv``, so the feature mix matches the
+training data.
+
+Two modes:
+
+    closed loop  --concurrency N virtual users send their next request as
+                 soon as the previous one completes (measures capacity)
+    open loop    --rate R requests/s arrive on a Poisson schedule whether
+                 or not earlier ones have completed; latency is measured
+                 from the scheduled arrival, so server stalls are not hidden
+
+Reports throughput, errors and p50/p95/p99 latency per endpoint.
+
+Run from the repository root against a running server (doctors are created
+in the database from DATABASE_URL, which must be the server's):
+
+    python server/benchmarks/loadgen.py --url http://localhost:8000 --concurrency 32 --duration 60
+
+or fully locally, starting the server on a scratch SQLite database:
+
+    python server/benchmarks/loadgen.py --spawn --database-url sqlite:///loadtest.db --rate 100
+"""
+
+import sys
+import os
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(SRC)
+
+import httpx
+
+ENDPOINTS = ["login", "create", "list", "get", "update", "delete"]
+DEFAULT_MIX = "login=1,create=3,list=4,get=6,update=3,delete=1"
+DOCTOR_PASSWORD = "loadtest-password"
+
+
+def parse_mix(mix: str) -> dict:
+    """Parse "login=1,create=3,..." into endpoint -> weight"""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}', expected one of {ENDPOINTS}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+class PayloadSampler:
+    """Samples patient payloads from the rows of the training CSV"""
+
+    def __init__(self, rng: random.Random):
+        from ml.dataset import load_dataset, COLUMN_FIELDS
+
+        X, _ = load_dataset()
+        self.rows = [
+            {COLUMN_FIELDS[column]: self._decode(column, value) for column, value in zip(X.columns, row)}
+            for row in X.itertuples(index=False)
+        ]
+        self.rng = rng
+
+    @staticmethod
+    def _decode(column: str, value):
+        if column == "AGE":
+            return int(value)
+        if column == "GENDER":
+            return bool(value == 1)
+        return bool(value == 2)
+
+    def patient(self) -> dict:
+        """A full patient payload (features of a random training row)"""
+        payload = dict(self.rng.choice(self.rows))
+        payload["age"] = max(18, payload["age"] + self.rng.randint(-2, 2))
+        payload["name"] = f"Load Test {self.rng.randrange(10 ** 6):06d}"
+        return payload
+
+    def changes(self) -> dict:
+        """A partial update: a few fields of another random row"""
+        source = self.patient()
+        fields = self.rng.sample(sorted(source), k=self.rng.randint(1, 3))
+        return {field: source[field] for field in fields}
+
+
+class Doctor:
+    def __init__(self, user_name: str):
+        self.user_name = user_name
+        self.token = None
+        self.patient_ids: list[int] = []
+        # Ids removed by a delete; reads and updates already in flight for them may 404
+        self.deleted_ids: set[int] = set()
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, doctors: list[Doctor], weights: dict,
+                 sampler: PayloadSampler, rng: random.Random):
+        self.client = client
+        self.doctors = doctors
+        self.names = list(weights)
+        self.weights = list(weights.values())
+        self.sampler = sampler
+        self.rng = rng
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        # 404s for patients deleted by a concurrent request, counted apart from errors
+        self.deleted_races = defaultdict(int)
+        self.dropped = 0
+
+    async def login(self, doctor: Doctor) -> bool:
+        response = await self.client.post(
+            "/api/doctors/login", json={"user_name": doctor.user_name, "password": DOCTOR_PASSWORD}
+        )
+        if response.status_code == 200:
+            doctor.token = response.json()["access_token"]
+        return response.status_code == 200
+
+    async def execute(self, endpoint: str, doctor: Doctor) -> bool:
+        """Send one request; returns whether it succeeded"""
+        if endpoint == "login":
+            return await self.login(doctor)
+
+        if endpoint == "create":
+            response = await self.client.post("/api/patients", json=self.sampler.patient(), headers=doctor.headers)
+            if response.status_code == 200:
+                doctor.patient_ids.append(response.json()["id"])
+            return response.status_code == 200
+
+        if endpoint == "list":
+            response = await self.client.get("/api/patients", headers=doctor.headers)
+            return response.status_code == 200
+
+        patient_id = self.rng.choice(doctor.patient_ids)
+        if endpoint == "get":
+            response = await self.client.get(f"/api/patients/{patient_id}", headers=doctor.headers)
+        elif endpoint == "update":
+            response = await self.client.put(
+                f"/api/patients/{patient_id}", json=self.sampler.changes(), headers=doctor.headers
+            )
+        else:
+            # Claim the id first so later requests don't pick it
+            doctor.patient_ids.remove(patient_id)
+            doctor.deleted_ids.add(patient_id)
+            response = await self.client.delete(f"/api/patients/{patient_id}", headers=doctor.headers)
+        if endpoint != "delete" and response.status_code == 404 and patient_id in doctor.deleted_ids:
+            # Picked before a concurrent delete of the same patient was sent
+            self.deleted_races[endpoint] += 1
+            return True
+        return response.status_code == 200
+
+    def pick(self) -> tuple[str, Doctor]:
+        doctor = self.rng.choice(self.doctors)
+        endpoint = self.rng.choices(self.names, self.weights)[0]
+        if endpoint in ("get", "update", "delete") and not doctor.patient_ids:
+            endpoint = "create"
+        return endpoint, doctor
+
+    async def request(self, endpoint: str, doctor: Doctor, started: float):
+        """Run one request and record its latency from ``started``"""
+        try:
+            ok = await self.execute(endpoint, doctor)
+        except httpx.HTTPError:
+            ok = False
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    async def closed_loop(self, concurrency: int, duration: float, think_time: float):
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            while time.perf_counter() < deadline:
+                endpoint, doctor = self.pick()
+                await self.request(endpoint, doctor, time.perf_counter())
+                if think_time:
+                    await asyncio.sleep(self.rng.expovariate(1 / think_time))
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+
+    async def open_loop(self, rate: float, duration: float, max_in_flight: int):
+        start = time.perf_counter()
+        in_flight = set()
+        scheduled = start
+        while scheduled < start + duration:
+            scheduled += self.rng.expovariate(rate)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= max_in_flight:
+                # Client-side limit reached: count the arrival instead of queueing it
+                self.dropped += 1
+                continue
+            endpoint, doctor = self.pick()
+            task = asyncio.create_task(self.request(endpoint, doctor, scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def print_report(generator: LoadGenerator, elapsed: float):
+    print(f"\n{'endpoint':<10} {'requests':>9} {'errors':>7} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    all_latencies = []
+    for endpoint in ENDPOINTS:
+        latencies = sorted(generator.latencies.get(endpoint, []))
+        if not latencies:
+            continue
+        all_latencies += latencies
+        print(
+            f"{endpoint:<10} {len(latencies):>9} {generator.errors[endpoint]:>7} {len(latencies) / elapsed:>8.1f} "
+            f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} "
+            f"{percentile(latencies, 0.99) * 1000:>8.1f} {latencies[-1] * 1000:>8.1f}"
+        )
+    if all_latencies:
+        all_latencies.sort()
+        print(
+            f"{'total':<10} {len(all_latencies):>9} {sum(generator.errors.values()):>7} "
+            f"{len(all_latencies) / elapsed:>8.1f} {percentile(all_latencies, 0.5) * 1000:>8.1f} "
+            f"{percentile(all_latencies, 0.95) * 1000:>8.1f} {percentile(all_latencies, 0.99) * 1000:>8.1f} "
+            f"{all_latencies[-1] * 1000:>8.1f}"
+        )
+    races = sum(generator.deleted_races.values())
+    if races:
+        print(f"\nℹ️  {races} get/update requests found their patient deleted by a concurrent request "
+              "(404, not counted as errors)")
+    if generator.dropped:
+        print(f"\n⚠️  {generator.dropped} arrivals skipped at the client in-flight limit, results understate load")
+
+
+def provision_doctors(count: int, prefix: str) -> list[Doctor]:
+    """Create the synthetic doctors (existing ones are reused)"""
+    from add_doctor import add_doctors
+
+    rows = [{"user_name": f"{prefix}{i:04d}", "password": DOCTOR_PASSWORD} for i in range(count)]
+    results = add_doctors(rows)
+    failed = [result for result in results if result["status"] not in ("created", "exists")]
+    if failed:
+        raise RuntimeError(f"Could not provision {len(failed)} doctors: {failed[0]['detail']}")
+    created = sum(1 for result in results if result["status"] == "created")
+    print(f"👨‍⚕️ {count} synthetic doctors ready ({created} created)")
+    return [Doctor(row["user_name"]) for row in rows]
+
+
+def spawn_server(port: int, workers: int) -> subprocess.Popen:
+    """Start the API with uvicorn from the repository root and wait until it is ready"""
+    env = dict(os.environ)
+    env.setdefault("ENCRYPTION_SALT", "loadtest-salt")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", SRC,
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Server did not become ready within 120s")
+
+
+async def run(args, doctors: list[Doctor]):
+    rng = random.Random(args.seed)
+    sampler = PayloadSampler(rng)
+    limit = args.concurrency if args.rate is None else args.max_in_flight
+    async with httpx.AsyncClient(
+        base_url=args.url, timeout=args.timeout,
+        limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit)
+    ) as client:
+        generator = LoadGenerator(client, doctors, parse_mix(args.mix), sampler, rng)
+
+        # Log everyone in and give each doctor a few patients before measuring
+        await asyncio.gather(*(generator.login(doctor) for doctor in doctors))
+        doctors[:] = [doctor for doctor in doctors if doctor.token]
+        if not doctors:
+            raise RuntimeError("No doctor could log in")
+        for _ in range(args.seed_patients):
+            await asyncio.gather(*(generator.execute("create", doctor) for doctor in doctors))
+        generator.latencies.clear()
+        generator.errors.clear()
+        generator.deleted_races.clear()
+
+        started = time.perf_counter()
+        if args.rate is None:
+            print(f"🔁 Closed loop: {args.concurrency} users for {args.duration:.0f}s")
+            await generator.closed_loop(args.concurrency, args.duration, args.think_time)
+        else:
+            print(f"📈 Open loop: {args.rate:.0f} requests/s for {args.duration:.0f}s")
+            await generator.open_loop(args.rate, args.duration, args.max_in_flight)
+        print_report(generator, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a MECHA-LUNG API server")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server base URL")
+    parser.add_argument("--spawn", action="store_true", help="Start a local server for the test")
+    parser.add_argument("--database-url", help="Database for --spawn and doctor provisioning (e.g. sqlite:///loadtest.db)")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn workers with --spawn")
+    parser.add_argument("--port", type=int, default=8765, help="Port with --spawn")
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--doctor-prefix", default="loadtest_doctor_")
+    parser.add_argument("--seed-patients", type=int, default=5, help="Patients created per doctor before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Endpoint weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=16, help="Closed loop: concurrent users")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Closed loop: mean pause between requests (s)")
+    parser.add_argument("--rate", type=float, help="Open loop: arrivals per second (enables open loop)")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Open loop: client-side in-flight limit")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout (s)")
+    parser.add_argument("--seed", type=int, default=420)
+    args = parser.parse_args()
+
+    if args.database_url:
+        # Must be set before the database modules are imported
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from db.database import Engine
+    from db.models import Base
+
+    print("🚀 MECHA-LUNG load generator")
+    print("=" * 40)
+    Base.metadata.create_all(bind=Engine)
+    doctors = provision_doctors(args.doctors, args.doctor_prefix)
+
+    server = None
+    if args.spawn:
+        server = spawn_server(args.port, args.server_workers)
+        args.url = f"http://127.0.0.1:{args.port}"
+        print(f"🌐 Started server at {args.url}")
+
+    try:
+        asyncio.run(run(args, doctors))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,7 @@ load_dotenv()
 from sqlalchemy import create_engine, text, inspect
 from config import settings
 from db.database import Engine
-from db.models import Base
+from db.models import Base, PatientData, create_patient_partitions
 
 def setup_database():
     """Complete database setup"""
@@ -50,8 +50,18 @@ def setup_database():
         existing_columns = [col['name'] for col in inspector.get_columns('patient_data')]
         print(f"📊 Patient data table columns: {existing_columns}")
         
-        # Check for required columns
-        required_columns = ['age', 'prediction_confidence']
+        # Check for required columns (column -> migration statements)
+        required_columns = {
+            'age': ["ALTER TABLE patient_data ADD COLUMN age INTEGER DEFAULT 0"],
+            'prediction_confidence': ["ALTER TABLE patient_data ADD COLUMN prediction_confidence FLOAT"],
+            'updated_at': [
+                "ALTER TABLE patient_data ADD COLUMN updated_at TIMESTAMP",
+                "UPDATE patient_data SET updated_at = created_at",
+            ],
+            'version': ["ALTER TABLE patient_data ADD COLUMN version INTEGER NOT NULL DEFAULT 1"],
+            'name_ciphertext': ["ALTER TABLE patient_data ADD COLUMN name_ciphertext BYTEA"],
+            'prediction_status': ["ALTER TABLE patient_data ADD COLUMN prediction_status VARCHAR(16) NOT NULL DEFAULT 'done'"],
+        }
         missing_columns = [col for col in required_columns if col not in existing_columns]
         
         if missing_columns:
@@ -59,12 +69,8 @@ def setup_database():
             with engine.connect() as conn:
                 for col_name in missing_columns:
                     try:
-                        if col_name == 'age':
-                            sql = "ALTER TABLE patient_data ADD COLUMN age INTEGER DEFAULT 0"
-                        elif col_name == 'prediction_confidence':
-                            sql = "ALTER TABLE patient_data ADD COLUMN prediction_confidence FLOAT"
-                        
-                        conn.execute(text(sql))
+                        for sql in required_columns[col_name]:
+                            conn.execute(text(sql))
                         conn.commit()
                         print(f"✅ Added column: {col_name}")
                     except Exception as e:
@@ -72,10 +78,182 @@ def setup_database():
                         return False
         else:
             print("✅ All required columns already exist")
+        
+        # Indexes used by per-doctor queries and deferred scoring recovery
+        with engine.connect() as conn:
+            try:
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_patient_data_doctor_id ON patient_data (doctor_id)"))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_patient_data_unscored ON patient_data (prediction_status) "
+                    "WHERE prediction_status <> 'done'"
+                ))
+                conn.commit()
+            except Exception as e:
+                print(f"❌ Error creating patient_data indexes: {e}")
+                return False
+    
+    # Hash-partition patient_data by doctor_id when PATIENT_PARTITIONS is set
+    if not partition_patient_data(engine):
+        return False
+    
+    # Convert legacy base64(Fernet) names to the compact binary format
+    if not migrate_name_ciphertexts(engine):
+        return False
+    
+    # Reject UPDATE, DELETE and TRUNCATE on the audit log
+    if not protect_audit_log(engine):
+        return False
     
     print("🎉 Database setup completed successfully!")
     return True
 
+def partition_patient_data(engine):
+    """
+    Create or migrate to PATIENT_PARTITIONS hash partitions of patient_data by doctor_id
+    
+    Migrating an existing plain table copies every row in one transaction that
+    holds an ACCESS EXCLUSIVE lock on patient_data from the first statement to
+    the commit: all patient reads and writes block for the whole copy, so stop
+    the API (or schedule a maintenance window) before running it.
+    """
+    
+    partitions = settings.PATIENT_PARTITIONS
+    if engine.dialect.name != "postgresql":
+        if partitions:
+            print("⚠️  PATIENT_PARTITIONS needs PostgreSQL, patient_data stays one table")
+        return True
+    
+    with engine.connect() as conn:
+        partitioned = conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'patient_data'::regclass)"
+        )).scalar()
+        existing = conn.execute(text(
+            "SELECT count(*) FROM pg_inherits WHERE inhparent = 'patient_data'::regclass"
+        )).scalar()
+    
+    if not partitions:
+        if partitioned:
+            print(f"⚠️  patient_data has {existing} partitions, set PATIENT_PARTITIONS={existing} for the server")
+        return True
+    
+    if partitioned:
+        if existing and existing != partitions:
+            print(f"❌ patient_data has {existing} partitions but PATIENT_PARTITIONS={partitions}; "
+                  "changing the partition count is not supported")
+            return False
+        if not existing:
+            with engine.begin() as conn:
+                create_patient_partitions(conn, partitions)
+            print(f"✅ Created {partitions} patient_data partitions")
+        return True
+    
+    # Move the rows of the plain table into a new partitioned one, all in one transaction
+    # (patient_data is locked until it commits)
+    print(f"🧩 Partitioning patient_data into {partitions} partitions by doctor_id...")
+    print("   patient_data is locked until the copy commits; stop the API server first")
+    columns = ", ".join(column.name for column in PatientData.__table__.columns)
+    try:
+        with engine.begin() as conn:
+            orphans = conn.execute(text("SELECT count(*) FROM patient_data WHERE doctor_id IS NULL")).scalar()
+            if orphans:
+                raise ValueError(f"{orphans} patients have no doctor_id and cannot be partitioned")
+            
+            conn.execute(text("ALTER TABLE patient_data RENAME TO patient_data_unpartitioned"))
+            conn.execute(text(
+                "ALTER TABLE patient_data_unpartitioned RENAME CONSTRAINT patient_data_pkey TO patient_data_unpartitioned_pkey"
+            ))
+            for index in ("ix_patient_data_id", "ix_patient_data_doctor_id", "ix_patient_data_unscored"):
+                conn.execute(text(f"ALTER INDEX IF EXISTS {index} RENAME TO {index}_unpartitioned"))
+            conn.execute(text("ALTER SEQUENCE IF EXISTS patient_data_id_seq RENAME TO patient_data_unpartitioned_id_seq"))
+            
+            # Creates the partitions too
+            PatientData.__table__.create(conn)
+            moved = conn.execute(text(
+                f"INSERT INTO patient_data ({columns}) SELECT {columns} FROM patient_data_unpartitioned"
+            )).rowcount
+            conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('patient_data', 'id'), "
+                "COALESCE((SELECT MAX(id) FROM patient_data), 0) + 1, false)"
+            ))
+            conn.execute(text("DROP TABLE patient_data_unpartitioned"))
+    except Exception as e:
+        print(f"❌ Error partitioning patient_data: {e}")
+        return False
+    
+    print(f"✅ Moved {moved} patients into {partitions} partitions")
+    return True
+
+def protect_audit_log(engine):
+    """Make audit_log append-only with triggers (PostgreSQL)"""
+    
+    if engine.dialect.name != "postgresql":
+        print("⚠️  audit_log append-only triggers need PostgreSQL, skipped")
+        return True
+    
+    print("🔏 Making audit_log append-only...")
+    statements = [
+        """
+        CREATE OR REPLACE FUNCTION audit_log_append_only() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'audit_log is append-only';
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS audit_log_no_modify ON audit_log",
+        """
+        CREATE TRIGGER audit_log_no_modify BEFORE UPDATE OR DELETE ON audit_log
+        FOR EACH ROW EXECUTE FUNCTION audit_log_append_only()
+        """,
+        "DROP TRIGGER IF EXISTS audit_log_no_truncate ON audit_log",
+        """
+        CREATE TRIGGER audit_log_no_truncate BEFORE TRUNCATE ON audit_log
+        FOR EACH STATEMENT EXECUTE FUNCTION audit_log_append_only()
+        """,
+    ]
+    try:
+        with engine.connect() as conn:
+            for sql in statements:
+                conn.execute(text(sql))
+            conn.commit()
+    except Exception as e:
+        print(f"❌ Error creating audit_log triggers: {e}")
+        return False
+    
+    print("✅ audit_log is append-only")
+    return True
+
+def migrate_name_ciphertexts(engine):
+    """Rewrite legacy encrypted names into the compact binary format"""
+    
+    with engine.connect() as conn:
+        legacy = conn.execute(text(
+            "SELECT count(*) FROM patient_data "
+            "WHERE name_ciphertext IS NULL AND name_encrypted IS NOT NULL AND name_encrypted <> ''"
+        )).scalar()
+    if not legacy:
+        return True
+    
+    print(f"🔐 Converting {legacy} encrypted patient names to the compact format...")
+    checkpoint_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "name_ciphertext_migration.checkpoint.json")
+    try:
+        from rotate_keys import rotate_keys
+        checkpoint = rotate_keys(
+            None, None, None,
+            chunk_size=5000,
+            workers=None,
+            checkpoint_path=checkpoint_path
+        )
+    except Exception as e:
+        print(f"❌ Error converting patient names: {e}")
+        print(f"   Re-run setup to resume from {checkpoint_path}")
+        return False
+    
+    if checkpoint["failed"]:
+        print(f"⚠️  {checkpoint['failed']} names could not be decrypted and were left unchanged "
+              f"(ids in {checkpoint_path}.failed)")
+    print(f"✅ Converted {checkpoint['rotated']} patient names")
+    return True
+
 def create_sample_doctor():
     """Create a sample doctor account"""
     
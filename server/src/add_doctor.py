@@ -1,14 +1,26 @@
 #!/usr/bin/env python3
 """
 Script to add a doctor to the database with encrypted password
+
+Usage:
+    python add_doctor.py                                  # interactive, one doctor
+    python add_doctor.py --file doctors.csv [--workers N]  # batch provisioning
+
+Batch files are either CSV with a ``user_name,password`` header or a JSON
+list of ``{"user_name": ..., "password": ...}`` objects.
 """
 
 import sys
 import os
+import csv
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from db.database import SessionLocal
 from db.models import Doctor
+from security import hash_password
 
 def add_doctor(username: str, password: str):
     """Add a new doctor to the database"""
@@ -47,10 +59,185 @@ def add_doctor(username: str, password: str):
     finally:
         db.close()
 
+def normalize_doctor_row(row) -> dict:
+    """
+    Normalize one row of a doctor file
+    
+    Args:
+        row: Parsed CSV row or JSON value
+        
+    Returns:
+        dict: Stripped "user_name" and "password" strings, plus "invalid" with
+              the reason when the row is not an object or a field is not a string
+    """
+    if not isinstance(row, dict):
+        return {"user_name": "", "password": "", "invalid": f"row must be an object, got {type(row).__name__}"}
+    
+    normalized, problems = {}, []
+    for field in ("user_name", "password"):
+        value = row.get(field)
+        if value is None:
+            value = ""
+        elif not isinstance(value, str):
+            problems.append(f"{field} must be a string, got {type(value).__name__}")
+            value = ""
+        normalized[field] = value.strip()
+    if problems:
+        normalized["invalid"] = "; ".join(problems)
+    return normalized
+
+def load_doctor_file(path: str) -> list[dict]:
+    """
+    Load doctor rows from a CSV or JSON file
+    
+    Args:
+        path: Path to a .csv or .json file
+        
+    Returns:
+        list: Rows with "user_name" and "password" keys ("invalid" for malformed rows)
+        
+    Raises:
+        ValueError: If a JSON file does not contain a list
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            rows = json.load(f)
+            if not isinstance(rows, list):
+                raise ValueError(f"{path} must contain a JSON list of doctors")
+        else:
+            rows = list(csv.DictReader(f))
+    
+    return [normalize_doctor_row(row) for row in rows]
+
+def add_doctors(rows: list[dict], workers: int = None) -> list[dict]:
+    """
+    Add many doctors at once
+    
+    Existing usernames are looked up with a single query, passwords are
+    hashed in parallel across a process pool (bcrypt dominates the cost),
+    and all new doctors are inserted in one transaction.
+    
+    Args:
+        rows: Rows with "user_name" and "password" keys (and "invalid" as set
+              by load_doctor_file)
+        workers: Number of hashing processes (defaults to CPU count)
+        
+    Returns:
+        list: One result per input row with "row", "user_name", "status"
+              ("created", "exists", "duplicate", "invalid" or "error")
+              and "detail"
+    """
+    results = [
+        {"row": i + 1, "user_name": row["user_name"], "status": None, "detail": ""}
+        for i, row in enumerate(rows)
+    ]
+    
+    # Validate rows and drop duplicates within the file
+    seen = set()
+    for result, row in zip(results, rows):
+        if row.get("invalid"):
+            result["status"] = "invalid"
+            result["detail"] = row["invalid"]
+        elif not row["user_name"] or not row["password"]:
+            result["status"] = "invalid"
+            result["detail"] = "user_name and password are required"
+        elif row["user_name"] in seen:
+            result["status"] = "duplicate"
+            result["detail"] = "username appears earlier in the file"
+        else:
+            seen.add(row["user_name"])
+    
+    db = SessionLocal()
+    try:
+        # One query for all usernames already in the database
+        if seen:
+            existing = {
+                user_name for (user_name,) in
+                db.query(Doctor.user_name).filter(Doctor.user_name.in_(seen)).all()
+            }
+        else:
+            existing = set()
+        
+        pending = []
+        for result, row in zip(results, rows):
+            if result["status"] is not None:
+                continue
+            if row["user_name"] in existing:
+                result["status"] = "exists"
+                result["detail"] = "username already registered"
+            else:
+                pending.append((result, row))
+        
+        if not pending:
+            return results
+        
+        # Hash passwords in parallel, bcrypt is CPU bound
+        passwords = [row["password"] for _, row in pending]
+        chunksize = max(1, len(passwords) // ((workers or os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            hashes = list(executor.map(hash_password, passwords, chunksize=chunksize))
+        
+        # Insert everything in a single transaction
+        db.add_all([
+            Doctor(user_name=row["user_name"], hashed_password=hashed)
+            for (_, row), hashed in zip(pending, hashes)
+        ])
+        db.commit()
+        
+        for result, _ in pending:
+            result["status"] = "created"
+        
+    except Exception as e:
+        db.rollback()
+        for result in results:
+            if result["status"] is None:
+                result["status"] = "error"
+                result["detail"] = str(e)
+    finally:
+        db.close()
+    
+    return results
+
+def print_report(results: list[dict]):
+    """Print a per-row provisioning report"""
+    icons = {"created": "✅", "exists": "⚠️", "duplicate": "⚠️", "invalid": "❌", "error": "❌"}
+    
+    for result in results:
+        icon = icons.get(result["status"], "❔")
+        line = f"{icon} row {result['row']:>5}  {result['user_name'] or '<empty>':<30} {result['status']}"
+        if result["detail"]:
+            line += f" ({result['detail']})"
+        print(line)
+    
+    print("=" * 40)
+    for status in icons:
+        count = sum(1 for result in results if result["status"] == status)
+        if count:
+            print(f"   {status}: {count}")
+
 def main():
+    parser = argparse.ArgumentParser(description="Add doctors to MECHA-LUNG")
+    parser.add_argument("--file", help="CSV or JSON file with user_name/password rows")
+    parser.add_argument("--workers", type=int, default=None, help="Password hashing processes")
+    args = parser.parse_args()
+    
     print("🏥 MECHA-LUNG Doctor Registration")
     print("=" * 40)
     
+    if args.file:
+        try:
+            rows = load_doctor_file(args.file)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read {args.file}: {e}")
+            sys.exit(1)
+        print(f"📋 Provisioning {len(rows)} doctors from {args.file}...")
+        results = add_doctors(rows, workers=args.workers)
+        print_report(results)
+        if any(result["status"] == "error" for result in results):
+            print("\n💥 Registration failed!")
+            sys.exit(1)
+        return
+    
     # Get input from user
     username = input("Enter username: ").strip()
     password = input("Enter password: ").strip()
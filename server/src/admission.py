@@ -0,0 +1,188 @@
+"""
+Admission control and load shedding
+
+Requests are grouped into route classes (auth, patient reads, patient
+writes, ML scoring, prediction long-polls). Each class has a concurrency limit and a bounded wait
+queue with a deadline. When the queue is full or the deadline passes the
+request is rejected right away with ``503`` and ``Retry-After`` instead of
+piling up in the threadpool until the client has given up.
+"""
+
+import asyncio
+import json
+from collections import deque
+from typing import Optional
+
+from config import settings
+from metrics import metrics
+
+# Paths never subject to admission control
+EXEMPT_PATHS = {"/", "/metrics", "/ready", "/docs", "/redoc", "/openapi.json"}
+
+# Patient routes that run the model
+ML_SUFFIXES = ("/explain", "/whatif")
+
+# Prediction status, long-polled with ?wait= while deferred scoring is pending.
+# A waiting poll holds no thread or DB connection, so it gets its own (larger)
+# limit instead of holding a read slot for up to 30 seconds.
+POLL_SUFFIX = "/prediction"
+
+
+def classify_request(method: str, path: str) -> Optional[str]:
+    """
+    Map a request to its route class
+
+    Args:
+        method: HTTP method
+        path: Request path
+
+    Returns:
+        str: "auth", "read", "write", "ml" or "poll"; None for exempt requests
+    """
+    if method == "OPTIONS" or path in EXEMPT_PATHS:
+        return None
+    if path.startswith("/api/doctors/login") or path.startswith("/api/doctors/register"):
+        return "auth"
+    if path.startswith("/api/patients"):
+        if method == "DELETE" or path == "/api/patients/bulk-delete":
+            return "write"
+        if path.endswith(ML_SUFFIXES) or method in ("POST", "PUT", "PATCH"):
+            return "ml"
+        if path.endswith(POLL_SUFFIX):
+            return "poll"
+        return "read"
+    return "read" if method in ("GET", "HEAD") else "write"
+
+
+class AdmissionGate:
+    """Concurrency limit with a bounded FIFO wait queue"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        """
+        Args:
+            name: Route class name (used as metric label)
+            limit: Maximum concurrent requests
+            max_queue: Maximum requests waiting for a slot
+            timeout: Maximum seconds a request waits in the queue
+        """
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """
+        Wait for a slot
+
+        Returns:
+            None when admitted, otherwise the rejection reason
+            ("queue_full" or "timeout")
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+            return None
+        except asyncio.TimeoutError:
+            if self._abandon(waiter) is None:
+                # Slot was handed over just as the deadline passed
+                return None
+            return "timeout"
+        except asyncio.CancelledError:
+            # Client went away; hand back a slot we may have been granted
+            if self._abandon(waiter) is None:
+                self.release()
+            raise
+
+    def _abandon(self, waiter) -> Optional[str]:
+        """Leave the queue; returns None if the slot was granted meanwhile"""
+        if waiter.done():
+            return None
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        return "abandoned"
+
+    def release(self):
+        """Free a slot, handing it to the oldest waiter if any"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying per-route-class admission gates"""
+
+    def __init__(self, app, limits: Optional[dict] = None):
+        self.app = app
+        limits = limits or settings.ADMISSION_LIMITS
+        self.gates = {
+            name: AdmissionGate(
+                name,
+                limit,
+                settings.ADMISSION_QUEUE_SIZE,
+                settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000.0
+            )
+            for name, limit in limits.items()
+        }
+        metrics.describe("admission_active", "Requests currently admitted per route class")
+        metrics.describe("admission_queue_depth", "Requests waiting for admission per route class")
+        metrics.describe("admission_rejected_total", "Requests rejected by admission control")
+        metrics.gauge_callback("admission_active", lambda: {
+            (("route_class", name),): gate.active for name, gate in self.gates.items()
+        })
+        metrics.gauge_callback("admission_queue_depth", lambda: {
+            (("route_class", name),): gate.queue_depth for name, gate in self.gates.items()
+        })
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify_request(scope["method"], scope["path"])
+        gate = self.gates.get(route_class)
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        rejection = await gate.acquire()
+        if rejection is not None:
+            metrics.inc("admission_rejected_total", route_class=route_class, reason=rejection)
+            await self._reject(send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "Server is overloaded, please retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(settings.ADMISSION_RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
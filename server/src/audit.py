@@ -0,0 +1,185 @@
+"""
+Batched asynchronous audit log
+
+Handlers call ``record_access`` which only appends events to an in-memory
+bounded queue. A background writer thread flushes them into ``audit_log``
+with one multi-row INSERT per batch, whenever AUDIT_BATCH_SIZE events are
+buffered or AUDIT_FLUSH_INTERVAL_MS has passed since the oldest one.
+
+When the queue is full, callers wait up to AUDIT_ENQUEUE_TIMEOUT_MS and then
+write their events synchronously, so events are slowed down, never dropped.
+``stop`` (called on shutdown and at exit) drains and flushes the queue.
+"""
+
+import atexit
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import insert
+
+from config import settings
+from db.database import Engine
+from db.models import AuditLog
+from metrics import metrics
+
+# Failed batches are retried this many times before they are logged instead
+MAX_WRITE_ATTEMPTS = 3
+
+
+class AuditWriter:
+    """Bounded in-memory event buffer drained by a background writer thread"""
+
+    def __init__(self, batch_size: int = 500, flush_interval_ms: float = 200,
+                 queue_size: int = 10000, enqueue_timeout_ms: float = 50):
+        """
+        Args:
+            batch_size: Maximum events per INSERT
+            flush_interval_ms: Maximum time an event waits in the buffer
+            queue_size: Buffered events before callers are slowed down
+            enqueue_timeout_ms: Time a caller waits for buffer space before
+                                writing its events synchronously
+        """
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.enqueue_timeout = enqueue_timeout_ms / 1000.0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        metrics.describe("audit_events_total", "Audit events recorded")
+        metrics.describe("audit_batches_total", "Audit log INSERT batches written")
+        metrics.describe("audit_sync_writes_total", "Audit events written synchronously because the buffer was full")
+        metrics.describe("audit_write_failures_total", "Audit events that could not be written to the database")
+        metrics.describe("audit_queue_depth", "Audit events waiting to be written")
+        metrics.gauge_callback("audit_queue_depth", self._queue.qsize)
+
+    def start(self):
+        """Start the writer thread"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10.0):
+        """Flush all buffered events and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def record(self, doctor_id: int, action: str, patient_ids: Iterable[Optional[int]]):
+        """
+        Buffer access events, one per patient
+
+        Args:
+            doctor_id: Doctor performing the action
+            action: Action name ("read", "update", ...)
+            patient_ids: Patients accessed (None for events without a patient)
+        """
+        occurred_at = datetime.utcnow()
+        events = [
+            {"occurred_at": occurred_at, "doctor_id": doctor_id, "action": action, "patient_id": patient_id}
+            for patient_id in patient_ids
+        ]
+        metrics.inc("audit_events_total", len(events), action=action)
+
+        if self._thread is None:
+            self._write(events)
+            return
+
+        for i, event in enumerate(events):
+            try:
+                self._queue.put(event, timeout=self.enqueue_timeout)
+            except queue.Full:
+                # Back-pressure: the caller pays for its own write
+                metrics.inc("audit_sync_writes_total", len(events) - i)
+                self._write(events[i:])
+                return
+
+    def _next_batch(self) -> tuple[list, bool]:
+        """Block for the next batch; returns (batch, stop_requested)"""
+        first = self._queue.get()
+        if first is None:
+            return self._drain(), True
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                event = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is None:
+                return batch + self._drain(), True
+            batch.append(event)
+        return batch, False
+
+    def _drain(self) -> list:
+        events = []
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                return events
+            if event is not None:
+                events.append(event)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            for start in range(0, len(batch), self.batch_size):
+                self._write(batch[start:start + self.batch_size])
+
+    def _write(self, events: list):
+        """Insert events with one multi-row INSERT, retrying failed batches"""
+        if not events:
+            return
+
+        for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+            try:
+                with Engine.begin() as conn:
+                    conn.execute(insert(AuditLog.__table__).values(events))
+                metrics.inc("audit_batches_total")
+                return
+            except Exception as e:
+                error = e
+                if attempt < MAX_WRITE_ATTEMPTS:
+                    time.sleep(0.1 * attempt)
+
+        # Keep the events in the server log rather than losing them
+        metrics.inc("audit_write_failures_total", len(events))
+        print(f"Writing {len(events)} audit events failed: {error}")
+        for event in events:
+            print("AUDIT " + json.dumps({**event, "occurred_at": event["occurred_at"].isoformat()}))
+
+
+_writer: Optional[AuditWriter] = None
+
+
+def get_audit_writer() -> AuditWriter:
+    """Get the process-wide audit writer configured from settings"""
+    global _writer
+    if _writer is None:
+        _writer = AuditWriter(
+            batch_size=settings.AUDIT_BATCH_SIZE,
+            flush_interval_ms=settings.AUDIT_FLUSH_INTERVAL_MS,
+            queue_size=settings.AUDIT_QUEUE_SIZE,
+            enqueue_timeout_ms=settings.AUDIT_ENQUEUE_TIMEOUT_MS
+        )
+    return _writer
+
+
+def record_access(doctor_id: int, action: str, patient_ids: Iterable[Optional[int]]):
+    """Record patient data access if auditing is enabled (see AuditWriter.record)"""
+    if settings.AUDIT_ENABLED:
+        get_audit_writer().record(doctor_id, action, patient_ids)
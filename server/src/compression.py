@@ -0,0 +1,148 @@
+"""
+Negotiated response compression
+
+Compresses complete response bodies of at least COMPRESSION_MIN_SIZE bytes
+with brotli (if the ``brotli`` package is installed and the client accepts
+``br``) or gzip. Streaming responses, already encoded responses and
+non-text content types are passed through unchanged.
+"""
+
+import gzip
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # optional dependency, gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/")
+
+# Bodies above this size are compressed off the event loop
+THREADPOOL_THRESHOLD = 64 * 1024
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the best supported encoding from an Accept-Encoding header
+
+    Args:
+        accept_encoding: Raw header value
+
+    Returns:
+        str: "br", "gzip" or None
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL)
+
+
+def with_vary(headers: list) -> list:
+    """Response headers with Accept-Encoding added to (or merged into) Vary"""
+    vary = [value for name, value in headers if name == b"vary"]
+    if any(b"accept-encoding" in value.lower() or value.strip() == b"*" for value in vary):
+        return list(headers)
+    return [(name, value) for name, value in headers if name != b"vary"] + [
+        (b"vary", b", ".join(vary + [b"Accept-Encoding"]))
+    ]
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing large responses with the negotiated encoding"""
+
+    def __init__(self, app, min_size: int = 1024):
+        """
+        Args:
+            app: ASGI application
+            min_size: Smallest body worth compressing, in bytes
+        """
+        self.app = app
+        self.min_size = min_size
+        metrics.describe("response_bytes_total", "Response body bytes before compression")
+        metrics.describe("response_compressed_bytes_total", "Response body bytes after compression")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                response_headers = dict(message.get("headers", []))
+                content_type = response_headers.get(b"content-type", b"")
+                if b"content-encoding" in response_headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if encoding is None or message.get("more_body", False) or len(body) < self.min_size:
+                # Not accepted, streaming or small response: send as is. It still varies
+                # with Accept-Encoding, so shared caches must not hand it to other clients.
+                passthrough = True
+                await send({**start_message, "headers": with_vary(start_message.get("headers", []))})
+                await send(message)
+                return
+
+            if len(body) > THREADPOOL_THRESHOLD:
+                compressed = await run_in_threadpool(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            metrics.inc("response_bytes_total", len(body), encoding=encoding)
+            metrics.inc("response_compressed_bytes_total", len(compressed), encoding=encoding)
+
+            response_headers = [
+                (name, value) for name, value in with_vary(start_message.get("headers", []))
+                if name != b"content-length"
+            ]
+            response_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+            ]
+            await send({**start_message, "headers": response_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -10,4 +10,8 @@ if "db:" in DATABASE_URL and not os.getenv("DOCKER_ENV"):
     DATABASE_URL = DATABASE_URL.replace("db:", "localhost:")
 
 Engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=Engine, autoflush=False, autocommit=False)
+# Objects stay loaded after commit. Every handler commits and then still reads the
+# current doctor's id (audit events) or serializes rows it already holds; expiring
+# them would reload each one with another query. Sessions live for one request, so
+# the kept values are at most as old as that request's own writes.
+SessionLocal = sessionmaker(bind=Engine, autoflush=False, autocommit=False, expire_on_commit=False)
@@ -0,0 +1,173 @@
+"""
+SQL statement accounting and N+1 detection
+
+SQLAlchemy cursor events count every statement and its DB time into the
+QueryStats of the current request. Statements executed repeatedly within
+one request (same SQL text, e.g. a lazy load per row) are flagged as
+likely N+1 patterns.
+"""
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from config import settings
+from metrics import metrics
+
+
+class QueryStats:
+    """Statement count, DB time and repeated statements of one unit of work"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.statements: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed: float):
+        with self._lock:
+            self.count += 1
+            self.total_time += elapsed
+            self.statements[statement] += 1
+
+    def repeated(self, threshold: int = 2) -> dict:
+        """Statements executed at least ``threshold`` times"""
+        return {statement: n for statement, n in self.statements.items() if n >= threshold}
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Collectors that see every statement regardless of context (test helper)
+_global_collectors: list[QueryStats] = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    for collector in list(_global_collectors):
+        collector.record(statement, elapsed)
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute is skipped for failed statements
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        connection.info["query_start_time"].pop()
+
+
+def install_query_hooks(engine):
+    """Attach statement accounting to an engine (idempotent)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """QueryStats of the request being handled, if any"""
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries():
+    """Collect QueryStats for the code run inside the block (same context only)"""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(max_count: int):
+    """
+    Fail if more than ``max_count`` statements run inside the block
+
+    Counts statements from all threads, so it also works around requests
+    made with FastAPI's TestClient:
+
+        with assert_max_queries(3):
+            client.get("/api/patients", headers=auth_headers)
+
+    Raises:
+        AssertionError: Too many statements; the message lists repeated ones
+    """
+    stats = QueryStats()
+    _global_collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _global_collectors.remove(stats)
+
+    if stats.count > max_count:
+        repeated = "".join(f"\n  {n}x {statement}" for statement, n in stats.repeated().items())
+        raise AssertionError(
+            f"Expected at most {max_count} queries, got {stats.count}"
+            + (f"; repeated statements:{repeated}" if repeated else "")
+        )
+
+
+class QueryAccountingMiddleware:
+    """
+    ASGI middleware giving each request its own QueryStats
+
+    Counts go to the metrics registry per route; with DEBUG they are also
+    attached to the response as X-DB-Query-Count, X-DB-Time-Ms and
+    X-DB-Repeated-Statements headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        metrics.describe("db_queries_total", "SQL statements executed per route")
+        metrics.describe("db_time_seconds_total", "Time spent in SQL statements per route")
+        metrics.describe("db_repeated_statements_total", "Likely N+1 statement repeats per route")
+        metrics.describe("db_requests_total", "Requests with query accounting per route")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-time-ms", f"{stats.total_time * 1000:.2f}".encode()),
+                    (b"x-db-repeated-statements", str(len(stats.repeated())).encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+            self._record(scope, stats)
+
+    @staticmethod
+    def _record(scope, stats: QueryStats):
+        route = getattr(scope.get("route"), "path", "unmatched")
+        repeated = stats.repeated()
+        metrics.inc("db_requests_total", route=route)
+        metrics.inc("db_queries_total", stats.count, route=route)
+        metrics.inc("db_time_seconds_total", stats.total_time, route=route)
+        if repeated:
+            metrics.inc("db_repeated_statements_total", sum(repeated.values()) - len(repeated), route=route)
+            if settings.DEBUG:
+                for statement, n in repeated.items():
+                    print(f"Possible N+1 in {scope['method']} {route}: {n}x {statement}")
@@ -1,12 +1,16 @@
-from sqlalchemy import Integer, String, Boolean, ForeignKey, DateTime, Float
+from sqlalchemy import Integer, BigInteger, String, Boolean, ForeignKey, DateTime, Float, LargeBinary, Index, text, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import mapped_column
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 from security import hash_password, verify_password
+from config import settings
 
 Base = declarative_base()
 
+# patient_data is hash-partitioned by doctor_id; the partition key must be part of the primary key
+PATIENT_DATA_PARTITIONED = settings.PATIENT_PARTITIONS > 0 and settings.DATABASE_URL.startswith("postgresql")
+
 class Doctor(Base):
     __tablename__ = "doctors"
     id = mapped_column(Integer, primary_key=True, index=True)
@@ -35,8 +39,9 @@ class Doctor(Base):
 
 class PatientData(Base):
     __tablename__ = "patient_data"
-    id = mapped_column(Integer, primary_key=True, index=True)
-    name_encrypted = mapped_column(String)  # Encrypted patient name
+    id = mapped_column(Integer, primary_key=True, index=True, autoincrement=True)
+    name_encrypted = mapped_column(String)  # Legacy base64(Fernet) patient name
+    name_ciphertext = mapped_column(LargeBinary, nullable=True)  # Encrypted patient name (compact binary format)
     age = mapped_column(Integer)
     biological_gender = mapped_column(Boolean)
     smoking = mapped_column(Boolean)
@@ -54,19 +59,46 @@ class PatientData(Base):
     chest_pain = mapped_column(Boolean)
     lung_cancer = mapped_column(Boolean)  # Set by ML prediction
     prediction_confidence = mapped_column(Float, nullable=True)  # ML confidence score
-    doctor_id = mapped_column(Integer, ForeignKey("doctors.id"))
+    prediction_status = mapped_column(String(16), default="done", nullable=False)  # "pending" while deferred scoring runs
+    doctor_id = mapped_column(Integer, ForeignKey("doctors.id"), index=True, primary_key=PATIENT_DATA_PARTITIONED)
     doctor = relationship("Doctor", back_populates="patient_data")
     created_at = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = mapped_column(Integer, default=1, nullable=False)  # Bumped on every update, used for ETags
+    
+    __table_args__ = (
+        # Lets the deferred scorer's recovery find pending and failed rows without a full scan
+        Index(
+            "ix_patient_data_unscored", "prediction_status",
+            postgresql_where=text("prediction_status <> 'done'"),
+            sqlite_where=text("prediction_status <> 'done'")
+        ),
+        # Partitions are created right after the table (create_patient_partitions below)
+        {"postgresql_partition_by": "HASH (doctor_id)"} if PATIENT_DATA_PARTITIONED else {},
+    )
+    
+    @staticmethod
+    def encrypted_name_values(name: str) -> dict:
+        """Column values storing an encrypted patient name (for UPDATE statements)"""
+        from encryption import encrypt_bytes
+        return {"name_ciphertext": encrypt_bytes(name), "name_encrypted": None}
     
     def set_encrypted_name(self, name: str):
         """Encrypt and set patient name"""
-        from encryption import encrypt_text
-        self.name_encrypted = encrypt_text(name)
+        for column, value in self.encrypted_name_values(name).items():
+            setattr(self, column, value)
+    
+    @staticmethod
+    def decrypt_name(name_ciphertext, name_encrypted) -> str:
+        """Decrypt a patient name from its column values (binary format first, then legacy)"""
+        from encryption import decrypt_bytes, decrypt_text
+        if name_ciphertext is not None:
+            return decrypt_bytes(name_ciphertext)
+        return decrypt_text(name_encrypted)
     
     def get_decrypted_name(self) -> str:
         """Get decrypted patient name"""
-        from encryption import decrypt_text
-        return decrypt_text(self.name_encrypted)
+        return self.decrypt_name(self.name_ciphertext, self.name_encrypted)
     
     def to_dict(self, include_decrypted_name: bool = True):
         """Convert to dictionary"""
@@ -89,8 +121,11 @@ class PatientData(Base):
             "chest_pain": self.chest_pain,
             "lung_cancer": self.lung_cancer,
             "prediction_confidence": self.prediction_confidence,
+            "prediction_status": self.prediction_status,
             "doctor_id": self.doctor_id,
-            "created_at": self.created_at.isoformat() if self.created_at else None
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "version": self.version
         }
         
         if include_decrypted_name:
@@ -98,4 +133,42 @@ class PatientData(Base):
         else:
             data["name"] = "[ENCRYPTED]"
             
-        return data
\ No newline at end of file
+        return data
+
+def create_patient_partitions(conn, partitions: int):
+    """Create the hash partitions of patient_data that don't exist yet"""
+    for remainder in range(partitions):
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS patient_data_p{remainder} PARTITION OF patient_data "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        ))
+
+if PATIENT_DATA_PARTITIONED:
+    @event.listens_for(PatientData.__table__, "after_create")
+    def _create_partitions_with_table(target, connection, **kw):
+        # Without partitions a partitioned table rejects every INSERT
+        create_patient_partitions(connection, settings.PATIENT_PARTITIONS)
+
+class AuditLog(Base):
+    """Append-only record of patient data access (written in batches by audit.py)"""
+    __tablename__ = "audit_log"
+    id = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    occurred_at = mapped_column(DateTime, nullable=False)
+    doctor_id = mapped_column(Integer, nullable=False)
+    action = mapped_column(String(32), nullable=False)  # "create", "read", "list", "update", "delete", ...
+    patient_id = mapped_column(Integer, nullable=True, index=True)  # No foreign key: entries outlive deleted patients
+    
+    __table_args__ = (
+        # Keyset pagination of a doctor's entries, newest first
+        Index("ix_audit_log_doctor_id_id", "doctor_id", "id"),
+    )
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            "id": self.id,
+            "occurred_at": self.occurred_at.isoformat(),
+            "doctor_id": self.doctor_id,
+            "action": self.action,
+            "patient_id": self.patient_id
+        }
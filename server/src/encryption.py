@@ -1,12 +1,25 @@
 """
 Encryption utilities for sensitive patient data
+
+Patient names are stored in a compact binary format:
+
+    key version (1 byte) | nonce (12 bytes) | AES-256-GCM ciphertext + tag
+
+The key version selects the key from the keyring, so rows encrypted with a
+previous key stay readable while they are being rotated. AES-GCM keys are
+derived with HKDF from the PBKDF2 master secret and the key version, so
+they never equal the Fernet key derived from the same password. The older
+base64(Fernet) text format is still readable through decrypt_text.
 """
 
 import os
 import base64
+from functools import lru_cache
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from config import settings
 
 def generate_key_from_password(password: str, salt: bytes = None) -> tuple[bytes, bytes]:
@@ -32,6 +45,24 @@ def generate_key_from_password(password: str, salt: bytes = None) -> tuple[bytes
     key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
     return key, salt
 
+@lru_cache(maxsize=8)
+def derive_key(password: str, salt: str) -> bytes:
+    """
+    Derive a Fernet key from a password and base64 encoded salt (cached)
+    
+    PBKDF2 with 100k iterations costs tens of milliseconds, so each
+    password/salt pair is only derived once per process.
+    
+    Args:
+        password: Password to derive key from
+        salt: Base64 encoded salt
+        
+    Returns:
+        bytes: Fernet key
+    """
+    key, _ = generate_key_from_password(password, base64.b64decode(salt))
+    return key
+
 def get_encryption_key() -> bytes:
     """
     Get or generate encryption key for patient data
@@ -48,8 +79,7 @@ def get_encryption_key() -> bytes:
         return key
     
     # Use existing salt
-    key, _ = generate_key_from_password(password, base64.b64decode(salt))
-    return key
+    return derive_key(password, salt)
 
 def encrypt_text(text: str) -> str:
     """
@@ -90,4 +120,117 @@ def decrypt_text(encrypted_text: str) -> str:
         return decrypted.decode()
     except Exception as e:
         print(f"Decryption error: {e}")
-        return "[ENCRYPTED]" 
\ No newline at end of file
+        return "[ENCRYPTED]" 
+
+NONCE_SIZE = 12
+
+def check_key_version(key_version: int):
+    """
+    Raise ValueError if a key version does not fit the version byte (1-255)
+    """
+    if not 1 <= key_version <= 255:
+        raise ValueError(f"Encryption key version must be between 1 and 255, got {key_version}")
+
+def derive_aes_key(master_key: bytes, key_version: int) -> AESGCM:
+    """
+    Derive the AES-256-GCM key of a key version with HKDF
+    
+    Args:
+        master_key: Fernet key (base64 encoded PBKDF2 output) used as master secret
+        key_version: Key version byte (1-255), bound into the HKDF info
+        
+    Returns:
+        AESGCM: Cipher for the compact binary format
+        
+    Raises:
+        ValueError: If key_version does not fit the version byte
+    """
+    check_key_version(key_version)
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=f"mecha-lung name aes-gcm v{key_version}".encode(),
+    )
+    return AESGCM(hkdf.derive(base64.urlsafe_b64decode(master_key)))
+
+@lru_cache(maxsize=1)
+def get_keyring() -> dict[int, AESGCM]:
+    """
+    Get the AES-GCM keys by key version
+    
+    The current key comes from ENCRYPTION_PASSWORD/ENCRYPTION_SALT under
+    ENCRYPTION_KEY_VERSION; previous keys from ENCRYPTION_PREVIOUS_KEYS.
+    """
+    keyring = {
+        version: derive_aes_key(derive_key(password, salt), version)
+        for version, (password, salt) in settings.ENCRYPTION_PREVIOUS_KEYS.items()
+    }
+    version = settings.ENCRYPTION_KEY_VERSION
+    keyring[version] = derive_aes_key(get_encryption_key(), version)
+    return keyring
+
+def encrypt_with_key(text: str, aesgcm: AESGCM, key_version: int) -> bytes:
+    """
+    Encrypt text into the compact binary format with a specific key
+    
+    Args:
+        text: Text to encrypt
+        aesgcm: Key to encrypt with
+        key_version: Version byte stored in front of the ciphertext
+        
+    Returns:
+        bytes: Key version, nonce and ciphertext
+    """
+    if not text:
+        return b""
+    
+    nonce = os.urandom(NONCE_SIZE)
+    return bytes([key_version]) + nonce + aesgcm.encrypt(nonce, text.encode(), None)
+
+def decrypt_with_keyring(data: bytes, keyring: dict[int, AESGCM]) -> str:
+    """
+    Decrypt the compact binary format, raising on unknown keys or tampering
+    
+    Args:
+        data: Key version, nonce and ciphertext
+        keyring: AES-GCM keys by key version
+        
+    Returns:
+        str: Decrypted text
+    """
+    if not data:
+        return ""
+    
+    data = bytes(data)
+    aesgcm = keyring[data[0]]
+    return aesgcm.decrypt(data[1:1 + NONCE_SIZE], data[1 + NONCE_SIZE:], None).decode()
+
+def encrypt_bytes(text: str) -> bytes:
+    """
+    Encrypt text into the compact binary format with the current key
+    
+    Args:
+        text: Text to encrypt
+        
+    Returns:
+        bytes: Key version, nonce and ciphertext
+    """
+    version = settings.ENCRYPTION_KEY_VERSION
+    return encrypt_with_key(text, get_keyring()[version], version)
+
+def decrypt_bytes(data: bytes) -> str:
+    """
+    Decrypt the compact binary format
+    
+    Args:
+        data: Key version, nonce and ciphertext
+        
+    Returns:
+        str: Decrypted text
+    """
+    try:
+        return decrypt_with_keyring(data, get_keyring())
+    except Exception as e:
+        print(f"Decryption error: {e!r}")
+        return "[ENCRYPTED]"
@@ -0,0 +1,96 @@
+"""
+ETag helpers for conditional GET on patient resources
+
+ETags are computed from version metadata only (a row's ``version`` counter,
+or a per-doctor aggregate over ``patient_data``), so a matching
+``If-None-Match`` can be answered with ``304`` before any row is loaded,
+decrypted or serialized.
+"""
+
+import hashlib
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from db.models import PatientData
+
+
+def patient_etag(patient_id: int, version: int) -> str:
+    """
+    Build the ETag for a single patient
+
+    Args:
+        patient_id: Patient primary key
+        version: Row version counter
+
+    Returns:
+        str: Weak ETag value
+    """
+    return f'W/"p{patient_id}.{version}"'
+
+
+def collection_etag(doctor_id: int, count: int, last_updated, version_sum: int) -> str:
+    """
+    Build the ETag for a doctor's patient list
+
+    Any insert, update or delete changes at least one of the row count, the
+    latest ``updated_at`` or the sum of row versions.
+
+    Args:
+        doctor_id: Owning doctor
+        count: Number of patients
+        last_updated: Latest ``updated_at`` among the patients
+        version_sum: Sum of the patients' version counters
+
+    Returns:
+        str: Weak ETag value
+    """
+    stamp = last_updated.isoformat() if last_updated else ""
+    digest = hashlib.sha1(f"{count}:{stamp}:{version_sum}".encode()).hexdigest()[:16]
+    return f'W/"d{doctor_id}.{digest}"'
+
+
+def get_patient_etag(db: Session, doctor_id: int, patient_id: int) -> Optional[str]:
+    """Look up a patient's ETag with a single-column query, None if not found"""
+    version = db.query(PatientData.version).filter(
+        PatientData.id == patient_id,
+        PatientData.doctor_id == doctor_id
+    ).scalar()
+    if version is None:
+        return None
+    return patient_etag(patient_id, version)
+
+
+def get_collection_etag(db: Session, doctor_id: int) -> str:
+    """Compute a doctor's patient list ETag with one aggregate query"""
+    count, last_updated, version_sum = db.query(
+        func.count(PatientData.id),
+        func.max(PatientData.updated_at),
+        func.coalesce(func.sum(PatientData.version), 0)
+    ).filter(PatientData.doctor_id == doctor_id).one()
+    return collection_etag(doctor_id, count, last_updated, version_sum)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag (weak comparison)
+
+    Args:
+        if_none_match: Raw header value, may list several tags or be "*"
+        etag: Current ETag of the resource
+
+    Returns:
+        bool: True if the client's copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    current = opaque(etag)
+    return any(opaque(tag) == current for tag in if_none_match.split(","))
@@ -1,12 +1,19 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Header, Response, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select, update, delete
 from sqlalchemy.orm import Session
 from typing import Optional, List
+from contextlib import asynccontextmanager
+import asyncio
+import time
 from datetime import timedelta
 
 from db.database import Engine, SessionLocal
-from db.models import Base, Doctor, PatientData
+from db.instrumentation import QueryAccountingMiddleware, install_query_hooks
+from db.models import Base, Doctor, PatientData, AuditLog
 from security import create_access_token, verify_token
 from config import settings
 from schemas import (
@@ -16,16 +23,72 @@ from schemas import (
     DoctorUpdate,
     PatientDataCreate,
     PatientDataResponse,
+    PatientDataFields,
     PatientDataUpdate,
+    PatientBulkUpdate,
+    PatientBulkDelete,
+    PatientExplanation,
+    PredictionStatus,
+    PatientWhatIfRequest,
+    PatientWhatIf,
+    AuditLogPage,
     Token,
     APIResponse
 )
-from ml.predict import predict_lung_cancer_risk, get_prediction_confidence
+from ml.batcher import get_batcher
+from ml import predict
+from ml.predict import FEATURE_FIELDS, predict_batch
+from ml.explain import explain
+from ml.whatif import what_if
+from admission import AdmissionControlMiddleware
+from profiling import ProfilingMiddleware, profiling_configured, read_profile
+from metrics import metrics
+from warmup import start_warmup, is_ready
+from audit import get_audit_writer, record_access
+from compression import CompressionMiddleware
+from projection import parse_fields, patient_columns, serialize_patient, projected_etag
+from scoring_queue import get_scorer, PENDING
+from etag import patient_etag, get_collection_etag, get_patient_etag, etag_matches
 
 # Create tables
 Base.metadata.create_all(bind=Engine)
 
-app = FastAPI(title="MECHA-LUNG API")
+# Seconds between database re-checks while long-polling a pending prediction
+PREDICTION_RECHECK_INTERVAL = 0.5
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background workers and warmup; finish queued background work on shutdown"""
+    if settings.DEFERRED_SCORING:
+        get_scorer().start()
+    if settings.AUDIT_ENABLED:
+        get_audit_writer().start()
+    # Warm up while already serving, so /ready can report 503 until the worker is warm
+    start_warmup()
+    yield
+    if settings.DEFERRED_SCORING:
+        get_scorer().stop()
+    if settings.AUDIT_ENABLED:
+        get_audit_writer().stop()
+
+app = FastAPI(title="MECHA-LUNG API", lifespan=lifespan)
+
+# Count SQL statements and DB time per request (flags likely N+1 patterns)
+install_query_hooks(Engine)
+app.add_middleware(QueryAccountingMiddleware)
+
+# Negotiated gzip/brotli compression of large responses
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, min_size=settings.COMPRESSION_MIN_SIZE)
+
+# Opt-in request profiling (innermost, so it only covers admitted requests)
+if profiling_configured():
+    app.add_middleware(ProfilingMiddleware)
+
+# Shed load early instead of queueing requests nobody waits for anymore
+# (added before CORS so rejections still carry CORS headers)
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
 
 # Add CORS middleware to allow frontend to connect
 app.add_middleware(
@@ -34,6 +97,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Profile-Id", "X-DB-Query-Count", "X-DB-Time-Ms", "X-DB-Repeated-Statements"],
 )
 
 # Security
@@ -80,6 +144,37 @@ def read_root():
         status="success"
     )
 
+@app.get("/ready")
+def read_ready():
+    """Readiness probe: 200 once this worker is warm, 503 before"""
+    if not is_ready():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Warming up"
+        )
+    return {"status": "ready"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Server metrics in the Prometheus text format"""
+    return metrics.render()
+
+@app.get("/api/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, current_user: Doctor = Depends(get_current_user)):
+    """Get a stored request profile in the collapsed-stack format"""
+    profile = read_profile(profile_id) if profiling_configured() else None
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return profile
+
+@app.get("/api/monitoring/drift")
+def get_prediction_drift(current_user: Doctor = Depends(get_current_user)):
+    """Live prediction statistics and drift against the training baseline (this worker)"""
+    return predict.monitor.drift_report()
+
 @app.post("/api/doctors/register", response_model=DoctorResponse)
 def register_doctor(doctor: DoctorCreate, db: Session = Depends(get_db)):
     """Register a new doctor with encrypted password"""
@@ -185,9 +280,12 @@ def create_patient(
         "chest_pain": patient.chest_pain
     }
     
-    # Get ML prediction
-    lung_cancer_risk = predict_lung_cancer_risk(prediction_data)
-    prediction_confidence = get_prediction_confidence(prediction_data)
+    # Get ML prediction (batched with concurrent requests), or defer it to the scoring queue
+    if settings.DEFERRED_SCORING:
+        lung_cancer_risk, prediction_confidence, prediction_status = None, None, PENDING
+    else:
+        lung_cancer_risk, prediction_confidence = get_batcher().predict(prediction_data)
+        prediction_status = "done"
     
     # Create patient record
     db_patient = PatientData(
@@ -208,6 +306,7 @@ def create_patient(
         chest_pain=patient.chest_pain,
         lung_cancer=lung_cancer_risk,
         prediction_confidence=prediction_confidence,
+        prediction_status=prediction_status,
         doctor_id=current_user.id
     )
     
@@ -219,98 +318,366 @@ def create_patient(
     db.commit()
     db.refresh(db_patient)
     
-    return db_patient.to_dict()
+    data = db_patient.to_dict()
+    schedule_deferred_scoring([data])
+    record_access(current_user.id, "create", [db_patient.id])
+    return data
+
+def parse_patient_fields(fields: Optional[str]) -> List[str]:
+    """Parse the fields query parameter, 400 for unknown field names"""
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
-@app.get("/api/patients", response_model=list[PatientDataResponse])
+# Patient reads return JSONResponse directly (sparse fieldsets, ETag headers), so their
+# response schema is documented here instead of validated through response_model
+PATIENT_READ_RESPONSES = {
+    304: {"description": "Not modified: the If-None-Match ETag still matches"},
+    400: {"description": "Unknown field name in `fields`"},
+}
+
+@app.get(
+    "/api/patients",
+    response_model=None,
+    responses={
+        200: {
+            "model": list[PatientDataFields],
+            "description": "The doctor's patients, each with all fields or only those in `fields` (plus id)"
+        },
+        **PATIENT_READ_RESPONSES
+    }
+)
 def get_patients(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all)"),
+    if_none_match: Optional[str] = Header(None),
     current_user: Doctor = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all patients for the current doctor"""
-    patients = db.query(PatientData).filter(PatientData.doctor_id == current_user.id).all()
-    return [patient.to_dict() for patient in patients]
+    selected = parse_patient_fields(fields)
+    
+    # Answer unchanged lists before loading or decrypting any row
+    etag = projected_etag(get_collection_etag(db, current_user.id), selected)
+    # One "list" event per request (no patient id), so polling a long list stays one audit row;
+    # a 304 is audited too, since the client still shows the list from its cache
+    if etag_matches(if_none_match, etag):
+        record_access(current_user.id, "list", [None])
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    rows = db.query(*patient_columns(selected)).filter(PatientData.doctor_id == current_user.id).all()
+    record_access(current_user.id, "list", [None])
+    return JSONResponse(
+        [serialize_patient(row, selected) for row in rows],
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+    )
+
+def schedule_deferred_scoring(patients: List[dict]):
+    """Queue committed patients still pending a prediction for background scoring"""
+    if not settings.DEFERRED_SCORING:
+        return
+    scorer = get_scorer()
+    for patient in patients:
+        if patient["prediction_status"] == PENDING:
+            scorer.enqueue(patient["id"], patient["version"], patient)
+
+def apply_patient_update(db: Session, doctor_id: int, patient_ids: List[int], update_data: dict) -> List[PatientData]:
+    """
+    Apply the same changes to a doctor's patients with UPDATE ... RETURNING
+    
+    When the changes set every model feature the new prediction is computed
+    up front and written by the same statement. When only some features
+    change, the updated rows are re-scored as one batch and the predictions
+    are written back in a second statement within the same transaction.
+    
+    Args:
+        db: Database session (the caller commits)
+        doctor_id: Only patients of this doctor are updated
+        patient_ids: Patients to update
+        update_data: Changed fields as given by the client
+        
+    Returns:
+        list: Updated patients (unchanged for an empty update); ids not found
+            for this doctor are missing
+    """
+    if not update_data:
+        # Nothing to change: keep the version (and ETags) as they are
+        return db.scalars(
+            select(PatientData).where(PatientData.id.in_(patient_ids), PatientData.doctor_id == doctor_id)
+        ).all()
+    
+    values = dict(update_data)
+    
+    # Handle name encryption separately
+    if "name" in values:
+        values.update(PatientData.encrypted_name_values(values.pop("name")))
+    
+    changed_features = [field for field in FEATURE_FIELDS if field in values]
+    rescore_after = bool(changed_features) and len(changed_features) < len(FEATURE_FIELDS)
+    if changed_features and settings.DEFERRED_SCORING:
+        # Scored in the background once the caller has committed (schedule_deferred_scoring)
+        values["prediction_status"] = PENDING
+        rescore_after = False
+    elif changed_features and not rescore_after:
+        values["lung_cancer"], values["prediction_confidence"] = get_batcher().predict(
+            {field: values[field] for field in FEATURE_FIELDS}
+        )
+    
+    # Bump the row version so cached copies (ETags) are invalidated
+    values["version"] = PatientData.version + 1
+    
+    patients = db.scalars(
+        update(PatientData)
+        .where(PatientData.id.in_(patient_ids), PatientData.doctor_id == doctor_id)
+        .values(values)
+        .returning(PatientData)
+        .execution_options(synchronize_session=False)
+    ).all()
+    
+    # Re-run ML prediction for rows whose remaining features come from the database
+    if rescore_after and patients:
+        rows = [{field: getattr(patient, field) for field in FEATURE_FIELDS} for patient in patients]
+        if len(rows) == 1:
+            predictions = [get_batcher().predict(rows[0])]
+        else:
+            predictions = predict_batch(rows)
+        
+        for patient, (risk, confidence) in zip(patients, predictions):
+            patient.lung_cancer = risk
+            patient.prediction_confidence = confidence
+        db.flush()
+    
+    return patients
+
+@app.patch("/api/patients/bulk", response_model=list[PatientDataResponse])
+def bulk_update_patients(
+    bulk_update: PatientBulkUpdate,
+    current_user: Doctor = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Apply the same changes to many patients in one statement"""
+    patients = apply_patient_update(
+        db, current_user.id, bulk_update.ids, bulk_update.changes.dict(exclude_unset=True)
+    )
+    
+    data = [patient.to_dict() for patient in patients]
+    db.commit()
+    schedule_deferred_scoring(data)
+    record_access(current_user.id, "update", [patient["id"] for patient in data])
+    
+    return data
+
+# POST, since request bodies on DELETE are dropped by many clients and proxies
+@app.post("/api/patients/bulk-delete")
+def bulk_delete_patients(
+    bulk_delete: PatientBulkDelete,
+    current_user: Doctor = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete many patients in one statement"""
+    deleted_ids = db.scalars(
+        delete(PatientData)
+        .where(PatientData.id.in_(bulk_delete.ids), PatientData.doctor_id == current_user.id)
+        .returning(PatientData.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    record_access(current_user.id, "delete", deleted_ids)
+    
+    deleted = set(deleted_ids)
+    return {
+        "message": f"{len(deleted)} patients deleted successfully",
+        "deleted_ids": sorted(deleted),
+        "missing_ids": sorted(set(bulk_delete.ids) - deleted)
+    }
 
-@app.get("/api/patients/{patient_id}", response_model=PatientDataResponse)
+@app.get(
+    "/api/patients/{patient_id}",
+    response_model=None,
+    responses={
+        200: {
+            "model": PatientDataFields,
+            "description": "The patient with all fields or only those in `fields` (plus id)"
+        },
+        404: {"description": "Patient not found"},
+        **PATIENT_READ_RESPONSES
+    }
+)
 def get_patient(
     patient_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all)"),
+    if_none_match: Optional[str] = Header(None),
     current_user: Doctor = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get a specific patient by ID"""
-    patient = db.query(PatientData).filter(
+    selected = parse_patient_fields(fields)
+    
+    # Answer unchanged patients before loading or decrypting the row
+    etag = get_patient_etag(db, current_user.id, patient_id)
+    if etag is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
+    etag = projected_etag(etag, selected)
+    if etag_matches(if_none_match, etag):
+        record_access(current_user.id, "read", [patient_id])
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    row = db.query(*patient_columns(selected)).filter(
         PatientData.id == patient_id,
         PatientData.doctor_id == current_user.id
     ).first()
     
-    if not patient:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Patient not found"
         )
     
-    return patient.to_dict()
+    record_access(current_user.id, "read", [patient_id])
+    return JSONResponse(
+        serialize_patient(row, selected),
+        headers={
+            "ETag": projected_etag(patient_etag(row.id, row.version), selected),
+            "Cache-Control": "private, no-cache"
+        }
+    )
 
-@app.put("/api/patients/{patient_id}", response_model=PatientDataResponse)
-def update_patient(
+@app.get("/api/patients/{patient_id}/prediction", response_model=PredictionStatus)
+async def get_patient_prediction(
     patient_id: int,
-    patient_update: PatientDataUpdate,
+    wait: float = Query(0, ge=0, le=30, description="Seconds to wait for a pending prediction"),
     current_user: Doctor = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Update a patient's information"""
-    patient = db.query(PatientData).filter(
+    """Get a patient's prediction status, optionally long-polling until it is scored"""
+    
+    def fetch():
+        try:
+            return db.query(
+                PatientData.prediction_status,
+                PatientData.lung_cancer,
+                PatientData.prediction_confidence
+            ).filter(
+                PatientData.id == patient_id,
+                PatientData.doctor_id == current_user.id
+            ).first()
+        finally:
+            # Return the connection (also the one used for authentication) to the pool
+            # so no connection is held while the request waits
+            db.close()
+    
+    row = await run_in_threadpool(fetch)
+    deadline = time.monotonic() + wait
+    scorer = get_scorer()
+    while row is not None and row.prediction_status == PENDING and time.monotonic() < deadline:
+        # Re-check once this worker's scorer has written another batch, or after
+        # PREDICTION_RECHECK_INTERVAL in case another server worker scored the row
+        seen = scorer.completed_batches
+        recheck = min(deadline, time.monotonic() + PREDICTION_RECHECK_INTERVAL)
+        while scorer.completed_batches == seen and time.monotonic() < recheck:
+            await asyncio.sleep(0.05)
+        row = await run_in_threadpool(fetch)
+    
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
+    
+    await run_in_threadpool(record_access, current_user.id, "read_prediction", [patient_id])
+    return {"patient_id": patient_id, **row._mapping}
+
+@app.get("/api/patients/{patient_id}/explain", response_model=PatientExplanation)
+def explain_patient(
+    patient_id: int,
+    current_user: Doctor = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Explain a patient's risk prediction with per-feature contributions"""
+    row = db.query(*[getattr(PatientData, field) for field in FEATURE_FIELDS]).filter(
         PatientData.id == patient_id,
         PatientData.doctor_id == current_user.id
     ).first()
     
-    if not patient:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Patient not found"
         )
     
-    # Update fields if provided
-    update_data = patient_update.dict(exclude_unset=True)
+    record_access(current_user.id, "explain", [patient_id])
+    return {"patient_id": patient_id, **explain(dict(row._mapping))}
+
+@app.post("/api/patients/{patient_id}/whatif", response_model=PatientWhatIf)
+def patient_what_if(
+    patient_id: int,
+    request: PatientWhatIfRequest,
+    current_user: Doctor = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Score counterfactual variants of a patient without changing the stored record"""
+    row = db.query(*[getattr(PatientData, field) for field in FEATURE_FIELDS]).filter(
+        PatientData.id == patient_id,
+        PatientData.doctor_id == current_user.id
+    ).first()
     
-    # Handle name encryption separately
-    if "name" in update_data:
-        patient.set_encrypted_name(update_data.pop("name"))
-    
-    # Update other fields
-    for field, value in update_data.items():
-        setattr(patient, field, value)
-    
-    # Re-run ML prediction if any symptoms changed
-    if any(field in update_data for field in [
-        "age", "biological_gender", "smoking", "yellow_fingers", "anxiety",
-        "peer_pressure", "chronic_disease", "fatigue", "allergy", "wheezing",
-        "alcohol", "coughing", "shortness_of_breath", "swallowing_difficulty", "chest_pain"
-    ]):
-        prediction_data = {
-            "age": patient.age,
-            "biological_gender": patient.biological_gender,
-            "smoking": patient.smoking,
-            "yellow_fingers": patient.yellow_fingers,
-            "anxiety": patient.anxiety,
-            "peer_pressure": patient.peer_pressure,
-            "chronic_disease": patient.chronic_disease,
-            "fatigue": patient.fatigue,
-            "allergy": patient.allergy,
-            "wheezing": patient.wheezing,
-            "alcohol": patient.alcohol,
-            "coughing": patient.coughing,
-            "shortness_of_breath": patient.shortness_of_breath,
-            "swallowing_difficulty": patient.swallowing_difficulty,
-            "chest_pain": patient.chest_pain
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
+    
+    scenarios = [
+        {
+            "name": scenario.name,
+            "changes": {
+                field: value for field, value in scenario.changes.dict(exclude_none=True).items()
+                if field in FEATURE_FIELDS
+            }
         }
-        
-        patient.lung_cancer = predict_lung_cancer_risk(prediction_data)
-        patient.prediction_confidence = get_prediction_confidence(prediction_data)
+        for scenario in request.scenarios
+    ]
+    try:
+        result = what_if(dict(row._mapping), request.toggles, request.ages, scenarios)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    record_access(current_user.id, "whatif", [patient_id])
+    return {"patient_id": patient_id, **result}
+
+@app.put("/api/patients/{patient_id}", response_model=PatientDataResponse)
+def update_patient(
+    patient_id: int,
+    patient_update: PatientDataUpdate,
+    current_user: Doctor = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Update a patient's information"""
+    patients = apply_patient_update(
+        db, current_user.id, [patient_id], patient_update.dict(exclude_unset=True)
+    )
+    
+    if not patients:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
     
+    data = patients[0].to_dict()
     db.commit()
-    db.refresh(patient)
+    schedule_deferred_scoring([data])
+    record_access(current_user.id, "update", [patient_id])
     
-    return patient.to_dict()
+    return data
 
 @app.delete("/api/patients/{patient_id}")
 def delete_patient(
@@ -319,22 +686,52 @@ def delete_patient(
     db: Session = Depends(get_db)
 ):
     """Delete a patient"""
-    patient = db.query(PatientData).filter(
-        PatientData.id == patient_id,
-        PatientData.doctor_id == current_user.id
-    ).first()
+    deleted_id = db.execute(
+        delete(PatientData)
+        .where(PatientData.id == patient_id, PatientData.doctor_id == current_user.id)
+        .returning(PatientData.id)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
     
-    if not patient:
+    if deleted_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Patient not found"
         )
     
-    db.delete(patient)
     db.commit()
+    record_access(current_user.id, "delete", [patient_id])
     
     return {"message": "Patient deleted successfully"}
 
+@app.get("/api/audit", response_model=AuditLogPage)
+def get_audit_log(
+    before: Optional[int] = Query(None, description="Return entries older than this entry id (next_before of the previous page)"),
+    patient_id: Optional[int] = None,
+    action: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: Doctor = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the current doctor's audit log entries, newest first (keyset pagination)"""
+    query = db.query(AuditLog).filter(AuditLog.doctor_id == current_user.id)
+    if before is not None:
+        query = query.filter(AuditLog.id < before)
+    if patient_id is not None:
+        query = query.filter(AuditLog.patient_id == patient_id)
+    if action is not None:
+        query = query.filter(AuditLog.action == action)
+    
+    # One extra row tells whether another page exists
+    entries = query.order_by(AuditLog.id.desc()).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    
+    return {
+        "entries": [entry.to_dict() for entry in entries],
+        "next_before": entries[-1].id if has_more else None
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
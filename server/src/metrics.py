@@ -0,0 +1,95 @@
+"""
+In-process metrics registry rendered in the Prometheus text format
+"""
+
+import threading
+from typing import Callable
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple) -> str:
+    if not key:
+        return ""
+    inner = ",".join(f'{name}="{value}"' for name, value in key)
+    return "{" + inner + "}"
+
+
+class Metrics:
+    """Thread-safe counters and gauges"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._gauges: dict[str, dict[tuple, float]] = {}
+        self._callbacks: dict[str, Callable[[], dict]] = {}
+        self._help: dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        """Set the HELP line for a metric"""
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increase a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """Set a gauge"""
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def gauge_callback(self, name: str, callback: Callable[[], dict]):
+        """
+        Register a gauge computed at scrape time
+
+        Args:
+            name: Metric name
+            callback: Returns a mapping of label dicts (as tuples of items) to values,
+                      or a plain number for an unlabeled gauge
+        """
+        self._callbacks[name] = callback
+
+    def get(self, name: str, **labels) -> float:
+        """Current value of a counter or gauge (0 if never set)"""
+        key = _label_key(labels)
+        with self._lock:
+            for store in (self._counters, self._gauges):
+                if name in store and key in store[name]:
+                    return store[name][key]
+        return 0
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            families = [
+                ("counter", name, dict(series)) for name, series in self._counters.items()
+            ] + [
+                ("gauge", name, dict(series)) for name, series in self._gauges.items()
+            ]
+
+        for name, callback in self._callbacks.items():
+            try:
+                value = callback()
+            except Exception:
+                continue
+            series = value if isinstance(value, dict) else {(): value}
+            families.append(("gauge", name, {_label_key(dict(k)): v for k, v in series.items()}))
+
+        for kind, name, series in sorted(families, key=lambda family: family[1]):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,133 @@
+"""
+Micro-batching scheduler for concurrent prediction requests
+
+Scoring one row with the random forest costs about the same as scoring a
+few dozen, so concurrent single-row requests are collected for up to
+``max_batch_size`` rows or ``max_wait_ms`` milliseconds and scored in one
+vectorized call. Each caller gets a future that resolves to its own result.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from config import settings
+from ml.predict import predict_batch
+
+
+class PredictionBatcher:
+    """Collects single-row prediction requests and scores them in batches"""
+
+    def __init__(
+        self,
+        predict_fn: Callable[[list[dict]], list] = predict_batch,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0
+    ):
+        """
+        Args:
+            predict_fn: Function scoring a list of rows, returning one result per row
+            max_batch_size: Maximum number of rows scored in one call
+            max_wait_ms: Maximum time the first row of a batch waits for company
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the background scoring thread (idempotent)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="prediction-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after scoring already queued rows"""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def submit(self, patient_data: dict) -> Future:
+        """
+        Queue one row for scoring
+
+        Args:
+            patient_data: Dictionary containing patient symptoms and data
+
+        Returns:
+            Future: Resolves to the predict_fn result for this row
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        future = Future()
+        self._queue.put((patient_data, future))
+        return future
+
+    def predict(self, patient_data: dict, timeout: Optional[float] = None):
+        """Score one row, blocking until its batch has been scored"""
+        return self.submit(patient_data).result(timeout=timeout)
+
+    def _collect(self, first) -> tuple[list, bool]:
+        """Collect a batch starting with ``first``; returns (batch, stop_requested)"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect(first)
+
+            # Drop requests whose callers already gave up
+            batch = [(row, future) for row, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.predict_fn([row for row, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+_batcher: Optional[PredictionBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> PredictionBatcher:
+    """Get the process-wide prediction batcher configured from settings"""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = PredictionBatcher(
+                    max_batch_size=settings.PREDICTION_BATCH_MAX_SIZE,
+                    max_wait_ms=settings.PREDICTION_BATCH_MAX_WAIT_MS
+                )
+                _batcher.start()
+    return _batcher
@@ -0,0 +1,150 @@
+"""
+Training dataset layer
+
+Normalizes the schema of ``data/lung_cancer.csv`` once (column names,
+GENDER and LUNG_CANCER encodings) and caches the result as compact
+``.npy`` arrays keyed by the source file's hash:
+
+    data/.cache/<sha256>/X.npy      uint8 features, column-major
+    data/.cache/<sha256>/y.npy      int8 labels
+    data/.cache/<sha256>/meta.json  column names and row count
+
+Later runs memory-map the arrays instead of re-parsing the CSV, so loading
+is zero-copy and scales to datasets larger than memory.
+"""
+
+import os
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PATH = "data/lung_cancer.csv"
+DEFAULT_CACHE_DIR = "data/.cache"
+LABEL_COLUMN = "LUNG_CANCER"
+
+# Canonical feature columns, in model input order
+FEATURE_COLUMNS = [
+    "GENDER", "AGE", "SMOKING", "YELLOW_FINGERS", "ANXIETY", "PEER_PRESSURE",
+    "CHRONIC_DISEASE", "FATIGUE", "ALLERGY", "WHEEZING", "ALCOHOL_CONSUMING",
+    "COUGHING", "SHORTNESS_OF_BREATH", "SWALLOWING_DIFFICULTY", "CHEST_PAIN"
+]
+
+# Model input column -> patient field
+COLUMN_FIELDS = {
+    "GENDER": "biological_gender",
+    "AGE": "age",
+    "SMOKING": "smoking",
+    "YELLOW_FINGERS": "yellow_fingers",
+    "ANXIETY": "anxiety",
+    "PEER_PRESSURE": "peer_pressure",
+    "CHRONIC_DISEASE": "chronic_disease",
+    "FATIGUE": "fatigue",
+    "ALLERGY": "allergy",
+    "WHEEZING": "wheezing",
+    "ALCOHOL_CONSUMING": "alcohol",
+    "COUGHING": "coughing",
+    "SHORTNESS_OF_BREATH": "shortness_of_breath",
+    "SWALLOWING_DIFFICULTY": "swallowing_difficulty",
+    "CHEST_PAIN": "chest_pain"
+}
+
+
+def normalize_column(name: str) -> str:
+    """
+    Normalize a column name ("FATIGUE " -> "FATIGUE", "CHRONIC DISEASE" -> "CHRONIC_DISEASE")
+
+    Args:
+        name: Raw column name
+
+    Returns:
+        str: Canonical column name
+    """
+    return "_".join(name.strip().upper().split())
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file, read in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_csv(path: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parse the source CSV into compact arrays
+
+    Args:
+        path: Path to the CSV file
+
+    Returns:
+        tuple: (uint8 features in FEATURE_COLUMNS order, int8 labels)
+    """
+    data = pd.read_csv(path)
+    data.columns = [normalize_column(column) for column in data.columns]
+
+    # Convert Female to 0, Male to 1 and the label to 0/1
+    data["GENDER"] = data["GENDER"].map({"F": 0, "M": 1})
+    data[LABEL_COLUMN] = data[LABEL_COLUMN].map({"YES": 1, "NO": 0})
+
+    missing = data[FEATURE_COLUMNS + [LABEL_COLUMN]].isna().any()
+    if missing.any():
+        raise ValueError(f"Unexpected values in columns: {list(missing[missing].index)}")
+    if data["AGE"].max() > np.iinfo(np.uint8).max:
+        raise ValueError("AGE does not fit into uint8")
+
+    X = np.asfortranarray(data[FEATURE_COLUMNS].to_numpy(dtype=np.uint8))
+    y = data[LABEL_COLUMN].to_numpy(dtype=np.int8)
+    return X, y
+
+
+def build_cache(path: str = DEFAULT_PATH, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """
+    Build the cache for a source file if it doesn't exist yet
+
+    Args:
+        path: Path to the CSV file
+        cache_dir: Cache root directory
+
+    Returns:
+        str: Cache directory of this source file version
+    """
+    target = os.path.join(cache_dir, file_hash(path))
+    if os.path.exists(os.path.join(target, "meta.json")):
+        return target
+
+    X, y = read_csv(path)
+    os.makedirs(target, exist_ok=True)
+    np.save(os.path.join(target, "X.npy"), X)
+    np.save(os.path.join(target, "y.npy"), y)
+
+    # meta.json is written last and marks the cache as complete
+    with open(os.path.join(target, "meta.json"), "w") as f:
+        json.dump({"source": path, "columns": FEATURE_COLUMNS, "rows": len(y)}, f)
+    return target
+
+
+def load_dataset(path: str = DEFAULT_PATH, cache_dir: str = DEFAULT_CACHE_DIR) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    Load features and labels, building the cache on first use
+
+    Args:
+        path: Path to the CSV file
+        cache_dir: Cache root directory
+
+    Returns:
+        tuple: (features with canonical column names, labels) backed by read-only memory maps
+    """
+    target = build_cache(path, cache_dir)
+    with open(os.path.join(target, "meta.json")) as f:
+        meta = json.load(f)
+
+    X = np.load(os.path.join(target, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(target, "y.npy"), mmap_mode="r")
+    return (
+        pd.DataFrame(X, columns=meta["columns"], copy=False),
+        pd.Series(y, name=LABEL_COLUMN, copy=False)
+    )
@@ -0,0 +1,143 @@
+"""
+Per-prediction feature contributions for tree models
+
+Uses the Saabas decomposition: every node stores the positive-class
+probability of the training samples that reached it, and each split on a
+sample's path moves that probability by (child - parent), credited to the
+split feature. The per-node deltas are precomputed once into a sparse
+(nodes x features) matrix, so explaining a batch is one ``decision_path``
+call and one sparse matrix product, about the cost of one more traversal.
+"""
+
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from ml import predict
+from ml.predict import to_model_frame, COLUMN_FIELDS
+from ml.dataset import FEATURE_COLUMNS, normalize_column
+
+
+class TreeExplainer:
+    """Saabas-style contribution explainer for a tree or a forest of trees"""
+
+    def __init__(self, model):
+        """
+        Args:
+            model: Fitted DecisionTreeClassifier or RandomForestClassifier
+        """
+        self.model = model
+        # Canonical names of the model's input columns, in model order
+        self.columns = [
+            normalize_column(name) for name in getattr(model, "feature_names_in_", FEATURE_COLUMNS)
+        ]
+        self.positive = list(model.classes_).index(1)
+
+        estimators = getattr(model, "estimators_", [model])
+        deltas = []
+        roots = []
+        for estimator in estimators:
+            delta, root = self._tree_deltas(estimator.tree_)
+            deltas.append(delta)
+            roots.append(root)
+
+        # Forest probabilities are the mean over trees
+        self.n_trees = len(estimators)
+        self.deltas = sparse.vstack(deltas).tocsr() / self.n_trees
+        self.base_value = float(np.mean(roots))
+
+    def _tree_deltas(self, tree) -> tuple:
+        """Build one tree's (nodes x features) delta matrix and its root probability"""
+        values = tree.value[:, 0, :]
+        probability = values[:, self.positive] / values.sum(axis=1)
+
+        nodes = np.arange(tree.node_count)
+        internal = tree.children_left != -1
+        parent = np.full(tree.node_count, -1)
+        parent[tree.children_left[internal]] = nodes[internal]
+        parent[tree.children_right[internal]] = nodes[internal]
+
+        children = nodes[parent >= 0]
+        delta = sparse.csr_matrix(
+            (
+                probability[children] - probability[parent[children]],
+                (children, tree.feature[parent[children]])
+            ),
+            shape=(tree.node_count, len(self.columns))
+        )
+        return delta, probability[0]
+
+    def contributions(self, X: pd.DataFrame) -> np.ndarray:
+        """
+        Compute feature contributions
+
+        Args:
+            X: Model input rows
+
+        Returns:
+            np.ndarray: (rows x features) contributions; base_value plus a row's
+                        sum equals its positive-class probability
+        """
+        path = self.model.decision_path(X)
+        if isinstance(path, tuple):
+            path = path[0]
+        return np.asarray((path @ self.deltas).todense())
+
+
+_explainer: Optional[TreeExplainer] = None
+_explainer_lock = threading.Lock()
+
+
+def get_explainer() -> TreeExplainer:
+    """Get the explainer for the served model, built on first use"""
+    global _explainer
+    if _explainer is None or _explainer.model is not predict.model:
+        with _explainer_lock:
+            if _explainer is None or _explainer.model is not predict.model:
+                _explainer = TreeExplainer(predict.model)
+    return _explainer
+
+
+def explain_batch(patients: list[dict]) -> list[dict]:
+    """
+    Explain lung cancer risk predictions for many patients
+
+    Args:
+        patients: List of dictionaries containing patient symptoms and data
+
+    Returns:
+        list: Per patient, a dict with "base_value", "risk" (positive-class
+              probability) and "contributions" sorted by absolute impact
+    """
+    if not patients:
+        return []
+
+    explainer = get_explainer()
+    X = to_model_frame(patients)
+    contributions = explainer.contributions(X)
+
+    explanations = []
+    for patient, row in zip(patients, contributions):
+        features = [
+            {
+                "feature": COLUMN_FIELDS[column],
+                "value": patient[COLUMN_FIELDS[column]],
+                "contribution": float(contribution)
+            }
+            for column, contribution in zip(explainer.columns, row)
+        ]
+        features.sort(key=lambda feature: abs(feature["contribution"]), reverse=True)
+        explanations.append({
+            "base_value": explainer.base_value,
+            "risk": explainer.base_value + float(row.sum()),
+            "contributions": features
+        })
+    return explanations
+
+
+def explain(patient_data: dict) -> dict:
+    """Explain the lung cancer risk prediction for one patient"""
+    return explain_batch([patient_data])[0]
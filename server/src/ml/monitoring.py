@@ -0,0 +1,316 @@
+"""
+Streaming prediction monitoring
+
+Every scored batch updates fixed-size sketches: per-feature histograms over
+model inputs, a histogram of prediction confidences, positive counts and
+running feature sums. Memory is constant and an update is a single
+``np.bincount`` over the batch, so monitoring adds no per-request state.
+
+``train.py`` saves the same profile computed on ``data/lung_cancer.csv`` as
+``monitoring_baseline.json``; ``drift_report`` compares the live sketches
+against it with the population stability index (PSI):
+
+    PSI < 0.1   stable
+    PSI < 0.25  moderate shift
+    otherwise   significant shift
+
+Sketches are per worker process, like every other metric in this server.
+"""
+
+import os
+import sys
+import json
+import threading
+from typing import Optional
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.dataset import FEATURE_COLUMNS, normalize_column
+from metrics import metrics
+
+BASELINE_FILENAME = "monitoring_baseline.json"
+
+# Inner bin edges per canonical column: symptoms are encoded 1/2, gender 0/1
+FEATURE_EDGES = {
+    column: [1.5] for column in FEATURE_COLUMNS
+}
+FEATURE_EDGES["GENDER"] = [0.5]
+FEATURE_EDGES["AGE"] = [40, 50, 55, 60, 65, 70, 75, 80]
+
+# Max class probability is always >= 0.5 for a binary model
+CONFIDENCE_EDGES = [0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95]
+
+# Encoded feature values are clipped into a lookup table of this size
+MAX_VALUE = 256
+
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+MIN_SAMPLES = 50
+
+
+def _bin_lookup() -> tuple[np.ndarray, list[slice]]:
+    """
+    Map every (column, encoded value) to a bin index in one flat counts array
+
+    Returns:
+        tuple: (columns x MAX_VALUE lookup table, slice of each column's bins)
+    """
+    lookup = np.empty((len(FEATURE_COLUMNS), MAX_VALUE), dtype=np.int64)
+    slices = []
+    offset = 0
+    values = np.arange(MAX_VALUE)
+    for i, column in enumerate(FEATURE_COLUMNS):
+        edges = FEATURE_EDGES[column]
+        lookup[i] = offset + np.searchsorted(edges, values, side="right")
+        slices.append(slice(offset, offset + len(edges) + 1))
+        offset += len(edges) + 1
+    return lookup, slices
+
+
+_LOOKUP, _SLICES = _bin_lookup()
+_N_BINS = _SLICES[-1].stop
+_COLUMN_INDEX = np.arange(len(FEATURE_COLUMNS))
+
+
+def psi(expected: np.ndarray, actual: np.ndarray, epsilon: float = 1e-4) -> float:
+    """
+    Population stability index between two histograms
+
+    Args:
+        expected: Baseline bin counts
+        actual: Live bin counts
+
+    Returns:
+        float: PSI, 0 for identical distributions
+    """
+    p = np.maximum(expected / max(expected.sum(), 1), epsilon)
+    q = np.maximum(actual / max(actual.sum(), 1), epsilon)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def drift_status(value: float) -> str:
+    if value < PSI_MODERATE:
+        return "stable"
+    if value < PSI_SIGNIFICANT:
+        return "moderate"
+    return "significant"
+
+
+class PredictionProfile:
+    """Constant-size distribution sketch of model inputs and outputs"""
+
+    def __init__(self):
+        self.count = 0
+        self.positives = 0
+        self.feature_counts = np.zeros(_N_BINS, dtype=np.int64)
+        self.feature_sums = np.zeros(len(FEATURE_COLUMNS), dtype=np.float64)
+        self.confidence_counts = np.zeros(len(CONFIDENCE_EDGES) + 1, dtype=np.int64)
+
+    def update(self, X: np.ndarray, labels: np.ndarray, confidences: np.ndarray):
+        """
+        Add a batch of predictions
+
+        Args:
+            X: (rows x FEATURE_COLUMNS) encoded model inputs
+            labels: Predicted labels (1 = high risk)
+            confidences: Max class probability per row
+        """
+        values = np.clip(X.astype(np.int64, copy=False), 0, MAX_VALUE - 1)
+        self.feature_counts += np.bincount(_LOOKUP[_COLUMN_INDEX, values].ravel(), minlength=_N_BINS)
+        self.feature_sums += values.sum(axis=0)
+        self.confidence_counts += np.bincount(
+            np.searchsorted(CONFIDENCE_EDGES, confidences, side="right"),
+            minlength=len(CONFIDENCE_EDGES) + 1
+        )
+        self.count += len(labels)
+        self.positives += int(np.count_nonzero(labels == 1))
+
+    def summary(self) -> dict:
+        """Counts, positive rate and feature means"""
+        count = max(self.count, 1)
+        return {
+            "count": self.count,
+            "positive_rate": self.positives / count,
+            "feature_means": dict(zip(FEATURE_COLUMNS, (self.feature_sums / count).tolist()))
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "positives": self.positives,
+            "feature_counts": self.feature_counts.tolist(),
+            "feature_sums": self.feature_sums.tolist(),
+            "confidence_counts": self.confidence_counts.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PredictionProfile":
+        profile = cls()
+        profile.count = data["count"]
+        profile.positives = data["positives"]
+        profile.feature_counts = np.array(data["feature_counts"], dtype=np.int64)
+        profile.feature_sums = np.array(data["feature_sums"], dtype=np.float64)
+        profile.confidence_counts = np.array(data["confidence_counts"], dtype=np.int64)
+        return profile
+
+
+def build_profile(model, X) -> PredictionProfile:
+    """
+    Profile a model's predictions on a dataset
+
+    Args:
+        model: Fitted classifier
+        X: Features with canonical column names (as returned by load_dataset)
+
+    Returns:
+        PredictionProfile: Sketch of the inputs and the model's predictions
+    """
+    names = getattr(model, "feature_names_in_", None)
+    model_X = X[FEATURE_COLUMNS]
+    if names is not None:
+        # Older models use the raw CSV column names
+        model_X = model_X.rename(columns={normalize_column(name): name for name in names})[list(names)]
+
+    probabilities = model.predict_proba(model_X)
+    profile = PredictionProfile()
+    profile.update(
+        np.asarray(X[FEATURE_COLUMNS]),
+        model.classes_[probabilities.argmax(axis=1)],
+        probabilities.max(axis=1)
+    )
+    return profile
+
+
+def save_baseline(models: dict, X, model_dir: str = "server/src/ml/model") -> None:
+    """
+    Save baseline profiles for model files, keeping saved profiles of other files
+
+    Args:
+        models: Model filename -> fitted classifier
+        X: Reference features with canonical column names
+        model_dir: Directory of the model files
+    """
+    path = os.path.join(model_dir, BASELINE_FILENAME)
+    edges = {"features": FEATURE_EDGES, "confidence": CONFIDENCE_EDGES}
+    baseline = {"edges": edges, "models": {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+        if saved["edges"] == edges:
+            baseline = saved
+
+    for filename, model in models.items():
+        baseline["models"][filename] = build_profile(model, X).to_dict()
+    with open(path, "w") as f:
+        json.dump(baseline, f)
+
+
+def load_baseline(model_path: str) -> Optional[PredictionProfile]:
+    """
+    Load the baseline profile saved for a model file
+
+    Args:
+        model_path: Path of the served model
+
+    Returns:
+        PredictionProfile or None if no compatible baseline was saved
+    """
+    path = os.path.join(os.path.dirname(model_path), BASELINE_FILENAME)
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as f:
+        baseline = json.load(f)
+    edges = baseline["edges"]
+    if edges["features"] != FEATURE_EDGES or edges["confidence"] != CONFIDENCE_EDGES:
+        print(f"Ignoring {path}: saved with different bins, re-run train.py")
+        return None
+
+    profile = baseline["models"].get(os.path.basename(model_path))
+    return PredictionProfile.from_dict(profile) if profile else None
+
+
+class PredictionMonitor:
+    """Live prediction sketches compared against a training baseline"""
+
+    def __init__(self, baseline: Optional[PredictionProfile] = None):
+        self.baseline = baseline
+        self.live = PredictionProfile()
+        self._lock = threading.Lock()
+
+        metrics.describe("predictions_monitored", "Predictions recorded by the drift monitor")
+        metrics.describe("prediction_positive_rate", "Share of monitored predictions that are high risk")
+        metrics.describe("prediction_feature_psi", "Input drift per feature against the training baseline")
+        metrics.gauge_callback("predictions_monitored", lambda: self.live.count)
+        metrics.gauge_callback("prediction_positive_rate", lambda: self.live.summary()["positive_rate"])
+        metrics.gauge_callback("prediction_feature_psi", lambda: {
+            (("feature", column),): value for column, value in self.feature_drift().items()
+        })
+
+    def record(self, X: np.ndarray, labels: np.ndarray, confidences: np.ndarray):
+        """Add a scored batch (see PredictionProfile.update)"""
+        with self._lock:
+            self.live.update(X, labels, confidences)
+
+    def reset(self):
+        with self._lock:
+            self.live = PredictionProfile()
+
+    def feature_drift(self) -> dict:
+        """Feature PSI per canonical column, empty without a baseline"""
+        if self.baseline is None:
+            return {}
+        with self._lock:
+            live_counts = self.live.feature_counts.copy()
+        return {
+            column: psi(self.baseline.feature_counts[bins], live_counts[bins])
+            for column, bins in zip(FEATURE_COLUMNS, _SLICES)
+        }
+
+    def drift_report(self) -> dict:
+        """
+        Compare live predictions against the baseline
+
+        Returns:
+            dict: Live and baseline summaries, confidence histogram and PSI per
+                  feature and for the confidence distribution
+        """
+        with self._lock:
+            live = PredictionProfile.from_dict(self.live.to_dict())
+
+        report = {
+            "live": live.summary(),
+            "baseline": self.baseline.summary() if self.baseline else None,
+            "confidence_histogram": {
+                "edges": CONFIDENCE_EDGES,
+                "live": live.confidence_counts.tolist(),
+                "baseline": self.baseline.confidence_counts.tolist() if self.baseline else None
+            },
+            "min_samples": MIN_SAMPLES,
+            "drift": None
+        }
+        if self.baseline is None or live.count < MIN_SAMPLES:
+            return report
+
+        features = {}
+        for column, bins in zip(FEATURE_COLUMNS, _SLICES):
+            value = psi(self.baseline.feature_counts[bins], live.feature_counts[bins])
+            features[column] = {"psi": value, "status": drift_status(value)}
+        confidence = psi(self.baseline.confidence_counts, live.confidence_counts)
+        report["drift"] = {
+            "features": features,
+            "confidence": {"psi": confidence, "status": drift_status(confidence)},
+            "positive_rate_delta": report["live"]["positive_rate"] - report["baseline"]["positive_rate"]
+        }
+        return report
+
+
+if __name__ == "__main__":
+    # Rebuild the baseline of the served model without retraining
+    from ml.dataset import load_dataset
+    from ml.predict import model, MODEL_PATH
+
+    X, _ = load_dataset()
+    save_baseline({os.path.basename(MODEL_PATH): model}, X, os.path.dirname(MODEL_PATH))
+    print(f"✅ Saved monitoring baseline for {MODEL_PATH}")
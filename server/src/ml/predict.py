@@ -2,57 +2,153 @@
 ML prediction module for lung cancer risk assessment
 """
 
+import os
+import json
 import joblib
 import pandas as pd
+from typing import Optional
+from config import settings
+from ml.dataset import FEATURE_COLUMNS, COLUMN_FIELDS, normalize_column
+from ml.monitoring import PredictionMonitor, load_baseline
 
-model = joblib.load("server/src/ml/model/lung_cancer_model.joblib")
+MODEL_DIR = "server/src/ml/model"
+DEFAULT_MODEL_PATH = f"{MODEL_DIR}/lung_cancer_model.joblib"
+VARIANTS_MANIFEST = f"{MODEL_DIR}/model_variants.json"
+
+def select_model_path(latency_budget_ms: float = 0, variant: Optional[str] = None) -> str:
+    """
+    Select the model file to serve from the variants written by train.py
+    
+    Args:
+        latency_budget_ms: Per-row latency budget, 0 disables budget-based selection
+        variant: Explicit variant name, takes precedence over the budget
+        
+    Returns:
+        str: Path of the model file (the production forest if nothing else applies)
+    """
+    if not (variant or latency_budget_ms) or not os.path.exists(VARIANTS_MANIFEST):
+        return DEFAULT_MODEL_PATH
+    
+    with open(VARIANTS_MANIFEST) as f:
+        manifest = json.load(f)
+    
+    if variant:
+        if variant not in manifest:
+            raise ValueError(f"Unknown model variant '{variant}', available: {sorted(manifest)}")
+        return manifest[variant]["path"]
+    
+    # Most accurate variant within budget, otherwise the fastest one
+    within_budget = [report for report in manifest.values() if report["latency_ms"] <= latency_budget_ms]
+    if within_budget:
+        best = max(within_budget, key=lambda report: (report["balanced_accuracy"], report["roc_auc"]))
+    else:
+        best = min(manifest.values(), key=lambda report: report["latency_ms"])
+    return best["path"]
+
+MODEL_PATH = select_model_path(settings.MODEL_LATENCY_BUDGET_MS, settings.MODEL_VARIANT)
+model = joblib.load(MODEL_PATH)
+
+# Live prediction sketches, compared against the baseline saved by train.py
+monitor = PredictionMonitor(load_baseline(MODEL_PATH))
+
+# Patient fields used as model inputs
+FEATURE_FIELDS = [
+    "age", "biological_gender", "smoking", "yellow_fingers", "anxiety",
+    "peer_pressure", "chronic_disease", "fatigue", "allergy", "wheezing",
+    "alcohol", "coughing", "shortness_of_breath", "swallowing_difficulty", "chest_pain"
+]
+
+# Models trained before the dataset layer use the raw CSV column names
+# ("FATIGUE ", "CHRONIC DISEASE"); map canonical names to the model's own
+MODEL_COLUMNS = [
+    {normalize_column(name): name for name in model.feature_names_in_}[column]
+    for column in FEATURE_COLUMNS
+] if hasattr(model, "feature_names_in_") else FEATURE_COLUMNS
+
+def encode_value(field: str, value) -> int:
+    """
+    Encode one patient field as the model expects it
+    
+    Args:
+        field: Patient field name
+        value: Field value
+        
+    Returns:
+        int: Age as is, gender as 0/1, symptoms as 1 (no) / 2 (yes)
+    """
+    if field == "age":
+        return value
+    if field == "biological_gender":
+        return 1 if value else 0
+    return 2 if value else 1
 
 def convert_data(patient_data: dict) -> dict:
     """
     Convert patient data to a format that can be used by the model
     """
-    return {
-        "GENDER": 1 if patient_data["biological_gender"] else 0,
-        "AGE": patient_data["age"],
-        "SMOKING": 2 if patient_data["smoking"] else 1, 
-        "YELLOW_FINGERS": 2 if patient_data["yellow_fingers"] else 1, 
-        "ANXIETY": 2 if patient_data["anxiety"] else 1, 
-        "PEER_PRESSURE": 2 if patient_data["peer_pressure"] else 1, 
-        "CHRONIC DISEASE": 2 if patient_data["chronic_disease"] else 1, 
-        "FATIGUE ": 2 if patient_data["fatigue"] else 1, 
-        "ALLERGY ": 2 if patient_data["allergy"] else 1, 
-        "WHEEZING": 2 if patient_data["wheezing"] else 1, 
-        "ALCOHOL CONSUMING": 2 if patient_data["alcohol"] else 1, 
-        "COUGHING": 2 if patient_data["coughing"] else 1, 
-        "SHORTNESS OF BREATH": 2 if patient_data["shortness_of_breath"] else 1, 
-        "SWALLOWING DIFFICULTY": 2 if patient_data["swallowing_difficulty"] else 1, 
-        "CHEST PAIN": 2 if patient_data["chest_pain"] else 1
-    }
-
-def predict_lung_cancer_risk(patient_data: dict) -> bool:
+    return {column: encode_value(field, patient_data[field]) for column, field in COLUMN_FIELDS.items()}
+
+def to_model_frame(patients: list[dict]) -> pd.DataFrame:
+    """
+    Build the model input frame for many patients
+    
+    Args:
+        patients: List of dictionaries containing patient symptoms and data
+        
+    Returns:
+        pd.DataFrame: One row per patient, columns named and ordered as the model expects
+    """
+    frame = pd.DataFrame([convert_data(patient) for patient in patients], columns=FEATURE_COLUMNS)
+    frame.columns = MODEL_COLUMNS
+    return frame[list(getattr(model, "feature_names_in_", MODEL_COLUMNS))]
+
+def predict_lung_cancer_risk(patient_data: dict, record: bool = True) -> bool:
     """
     Prediction function for lung cancer risk
     
     Args:
         patient_data: Dictionary containing patient symptoms and data
+        record: Add the prediction to the monitoring sketches
         
     Returns:
         bool: Predicted lung cancer risk (True = high risk, False = low risk)
     """
-    converted_data = convert_data(patient_data)
-    converted_data = pd.DataFrame([converted_data])
-    return model.predict(converted_data)[0]
+    risk, _ = predict_batch([patient_data], record=record)[0]
+    return risk
 
-def get_prediction_confidence(patient_data: dict) -> float:
+def get_prediction_confidence(patient_data: dict, record: bool = True) -> float:
     """
     Mocked confidence score for the prediction
     
     Args:
         patient_data: Dictionary containing patient symptoms and data
+        record: Add the prediction to the monitoring sketches (pass False when
+            the same patient was already recorded by predict_lung_cancer_risk)
         
     Returns:
         float: Confidence score between 0.0 and 1.0
     """
-    converted_data = convert_data(patient_data)
-    converted_data = pd.DataFrame([converted_data])
-    return float(model.predict_proba(converted_data).max(axis=1)[0])
\ No newline at end of file
+    _, confidence = predict_batch([patient_data], record=record)[0]
+    return confidence
+
+def predict_batch(patients: list[dict], record: bool = True) -> list[tuple[bool, float]]:
+    """
+    Predict lung cancer risk and confidence for many patients in one call
+    
+    Args:
+        patients: List of dictionaries containing patient symptoms and data
+        record: Add the predictions to the monitoring sketches
+        
+    Returns:
+        list: (risk, confidence) tuples in the same order as the input
+    """
+    if not patients:
+        return []
+    
+    converted_data = to_model_frame(patients)
+    probabilities = model.predict_proba(converted_data)
+    labels = model.classes_[probabilities.argmax(axis=1)]
+    confidences = probabilities.max(axis=1)
+    if record:
+        monitor.record(converted_data[MODEL_COLUMNS].to_numpy(), labels, confidences)
+    return [(bool(label), float(confidence)) for label, confidence in zip(labels, confidences)]
\ No newline at end of file
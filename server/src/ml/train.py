@@ -1,34 +1,34 @@
 """
 Training script for lung cancer risk assessment.
 """
+import os
+import sys
+import json
+import pickle
+import time
 import pandas as pd
 import numpy as np
 import joblib
 from imblearn.over_sampling import SMOTE
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import balanced_accuracy_score, classification_report
+from sklearn.metrics import balanced_accuracy_score, classification_report, roc_auc_score
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
 import matplotlib.pyplot as plt
 from sklearn.metrics import roc_curve, auc, confusion_matrix, precision_recall_curve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.dataset import load_dataset
+from ml.monitoring import save_baseline
 
 
 def prepare_data(path: str = "data/lung_cancer.csv") -> tuple[pd.DataFrame, pd.Series]:
     """
     Prepare data for training
     :param path: Path to the data file
-    :return: Tuple of features and labels
+    :return: Tuple of features and labels (normalized column names, uint8/int8,
+             loaded from the columnar cache in data/.cache)
     """
-    data = pd.read_csv(path)
-    
-    X = data.drop("LUNG_CANCER", axis=1)
-    y = data["LUNG_CANCER"]
-
-    # Convert Female to 0, Male to 1
-    X["GENDER"] = X["GENDER"].map({"F": 0, "M": 1})
-
-    # Convert Lung_Cancer to 0, 1
-    y = y.map({"YES": 1, "NO": 0})
-    return X, y
+    return load_dataset(path)
 
 def oversample_data(X: pd.DataFrame, y: pd.Series) -> tuple[pd.DataFrame, pd.Series]:
     """
@@ -83,6 +83,95 @@ def evaluate_model(model: RandomForestClassifier, X_test: pd.DataFrame, y_test:
     print("PR-AUC for no lung cancer:", pr_auc)
     print("macro PR-AUC:", (pr_auc + pr_auc_no_lung_cancer) / 2)    
 
+def train_compact_variants(
+    model: RandomForestClassifier, X_train: pd.DataFrame, y_train: pd.Series
+) -> dict:
+    """
+    Train cheaper variants of the production forest
+    :param model: Trained production forest
+    :param X_train: Training data
+    :param y_train: Training labels
+    :return: Variant name -> trained model (including the production forest)
+    """
+    depth_limited = RandomForestClassifier(
+        class_weight="balanced", n_estimators=100, max_depth=8, min_samples_leaf=2, random_state=420
+    )
+    depth_limited.fit(X_train, y_train)
+
+    small = RandomForestClassifier(
+        class_weight="balanced", n_estimators=20, max_depth=8, random_state=420
+    )
+    small.fit(X_train, y_train)
+
+    # Distill the forest into one tree trained on the forest's own predictions
+    distilled = DecisionTreeClassifier(max_depth=6, min_samples_leaf=2, random_state=420)
+    distilled.fit(X_train, model.predict(X_train))
+
+    return {
+        "forest": model,
+        "forest_depth8": depth_limited,
+        "forest_small": small,
+        "distilled_tree": distilled,
+    }
+
+def measure_variant(model, X_test: pd.DataFrame, y_test: pd.Series, repeats: int = 200) -> dict:
+    """
+    Measure accuracy, size and single-row latency of a model
+    :param model: Trained model
+    :param X_test: Test data
+    :param y_test: Test labels
+    :param repeats: Number of timed single-row predictions
+    :return: Report with balanced_accuracy, roc_auc, size_bytes and latency_ms
+    """
+    y_pred = model.predict(X_test)
+    positive = list(model.classes_).index(1)
+    y_score = model.predict_proba(X_test)[:, positive]
+
+    row = X_test.iloc[[0]]
+    model.predict_proba(row)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "balanced_accuracy": float(balanced_accuracy_score(y_test, y_pred)),
+        "roc_auc": float(roc_auc_score(y_test, y_score)),
+        "size_bytes": len(pickle.dumps(model)),
+        "latency_ms": float(np.median(timings) * 1000),
+    }
+
+def save_variants(variants: dict, reports: dict, model_dir: str = "server/src/ml/model") -> dict:
+    """
+    Save model variants and a manifest with their reports
+    :param variants: Variant name -> trained model
+    :param reports: Variant name -> report from measure_variant
+    :param model_dir: Output directory
+    :return: Manifest, variant name -> report with the model path
+    """
+    manifest = {}
+    for name, variant in variants.items():
+        filename = "lung_cancer_model.joblib" if name == "forest" else f"lung_cancer_model_{name}.joblib"
+        joblib.dump(variant, f"{model_dir}/{filename}")
+        manifest[name] = {"path": f"{model_dir}/{filename}", **reports[name]}
+
+    with open(f"{model_dir}/model_variants.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def print_variant_reports(reports: dict) -> None:
+    """
+    Print a comparison table of variant reports
+    :param reports: Variant name -> report from measure_variant
+    """
+    print(f"{'variant':<16} {'bal. acc':>9} {'ROC-AUC':>8} {'size KB':>9} {'latency ms':>11}")
+    for name, report in reports.items():
+        print(
+            f"{name:<16} {report['balanced_accuracy']:>9.3f} {report['roc_auc']:>8.3f} "
+            f"{report['size_bytes'] / 1024:>9.1f} {report['latency_ms']:>11.3f}"
+        )
+
 
 if __name__ == "__main__":
     X, y = prepare_data()
@@ -98,5 +187,15 @@ if __name__ == "__main__":
 
     evaluate_model(model, X_test, y_test)
 
-    # save model
-    joblib.dump(model, "server/src/ml/model/lung_cancer_model.joblib")
+    # Compact variants for latency-budgeted serving
+    variants = train_compact_variants(model, X_train, y_train)
+    reports = {name: measure_variant(variant, X_test, y_test) for name, variant in variants.items()}
+    print_variant_reports(reports)
+
+    # save model and variants
+    manifest = save_variants(variants, reports)
+
+    # Baseline profiles on the source data for drift monitoring
+    save_baseline({
+        os.path.basename(entry["path"]): variants[name] for name, entry in manifest.items()
+    }, X)
@@ -0,0 +1,94 @@
+"""
+Counterfactual ("what if") risk exploration
+
+Builds one model input matrix holding the patient's current features in
+row 0 and one counterfactual per following row (single-symptom toggles, age
+sweeps, user-specified combinations), scores the whole matrix with a single
+``predict_proba`` call and reports each scenario's risk change. Nothing is
+persisted and the predictions are not recorded by the drift monitor.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ml import predict
+from ml.predict import to_model_frame, encode_value, COLUMN_FIELDS, FEATURE_FIELDS
+from ml.dataset import normalize_column
+
+# Fields toggled one at a time; biological gender is not a what-if
+TOGGLE_FIELDS = [field for field in FEATURE_FIELDS if field not in ("age", "biological_gender")]
+
+# Upper bound on counterfactual rows per request
+MAX_SCENARIOS = 256
+
+
+def describe_changes(changes: dict) -> str:
+    """Readable scenario label ("smoking=False, alcohol=False")"""
+    return ", ".join(f"{field}={value}" for field, value in changes.items())
+
+
+def what_if(patient_data: dict, toggles: bool = True, ages: list[int] = (), scenarios: list[dict] = ()) -> dict:
+    """
+    Score counterfactual variants of a patient in one vectorized call
+
+    Args:
+        patient_data: Dictionary containing patient symptoms and data
+        toggles: Add one scenario per flipped symptom in TOGGLE_FIELDS
+        ages: Ages to evaluate with all other features unchanged
+        scenarios: User combinations, dicts with "changes" (field -> value)
+                   and an optional "name"
+
+    Returns:
+        dict: "risk" (current positive-class probability) and "scenarios",
+              each with "scenario", "changes", "risk", "delta" and
+              "lung_cancer", sorted by absolute delta
+    """
+    frame = to_model_frame([patient_data])
+    positions = {COLUMN_FIELDS[normalize_column(name)]: i for i, name in enumerate(frame.columns)}
+
+    toggle_fields = TOGGLE_FIELDS if toggles else []
+    ages = [age for age in ages if age != patient_data["age"]]
+    changes = (
+        [{field: not patient_data[field]} for field in toggle_fields]
+        + [{"age": age} for age in ages]
+        + [dict(scenario["changes"]) for scenario in scenarios]
+    )
+    labels = [describe_changes(change) for change in changes[:len(toggle_fields) + len(ages)]] + [
+        scenario.get("name") or describe_changes(scenario["changes"]) for scenario in scenarios
+    ]
+    if len(changes) > MAX_SCENARIOS:
+        raise ValueError(f"At most {MAX_SCENARIOS} scenarios per request")
+
+    # Row 0 is the patient as stored, row k the k-th counterfactual
+    X = np.repeat(frame.to_numpy(), len(changes) + 1, axis=0)
+
+    toggle_rows = np.arange(1, len(toggle_fields) + 1)
+    X[toggle_rows, [positions[field] for field in toggle_fields]] = [
+        encode_value(field, not patient_data[field]) for field in toggle_fields
+    ]
+
+    age_rows = np.arange(len(toggle_fields) + 1, len(toggle_fields) + len(ages) + 1)
+    X[age_rows, positions["age"]] = ages
+
+    first_scenario_row = len(toggle_fields) + len(ages) + 1
+    for row, scenario in enumerate(scenarios, start=first_scenario_row):
+        for field, value in scenario["changes"].items():
+            X[row, positions[field]] = encode_value(field, value)
+
+    model = predict.model
+    probabilities = model.predict_proba(pd.DataFrame(X, columns=frame.columns))
+    risks = probabilities[:, list(model.classes_).index(1)]
+    predicted = model.classes_[probabilities.argmax(axis=1)]
+
+    results = [
+        {
+            "scenario": label,
+            "changes": change,
+            "risk": float(risk),
+            "delta": float(risk - risks[0]),
+            "lung_cancer": bool(label_value)
+        }
+        for label, change, risk, label_value in zip(labels, changes, risks[1:], predicted[1:])
+    ]
+    results.sort(key=lambda result: abs(result["delta"]), reverse=True)
+    return {"risk": float(risks[0]), "scenarios": results}
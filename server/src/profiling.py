@@ -0,0 +1,196 @@
+"""
+On-demand sampling profiler for API requests
+
+A background thread samples Python stacks while a request runs and
+aggregates them into the collapsed-stack format ("frame;frame;frame count"
+per line), which flamegraph.pl and speedscope import directly.
+
+Profiling is opt-in:
+    * with PROFILING_ENABLED, a request carrying ``X-Profile: 1`` and a valid
+      bearer token is profiled and the profile is written to PROFILE_DIR; its
+      file name is returned in the ``X-Profile-Id`` response header
+    * with PROFILE_EVERY_N > 0, every Nth request is profiled the same way
+
+Only the newest PROFILE_MAX_FILES profiles are kept.
+
+Sync endpoints run on threadpool workers, so all threads are sampled except
+the sampler itself and threads that are idle (waiting on a lock, queue or
+selector). With concurrent traffic a profile therefore also contains other
+requests' work; profile under light load for clean per-request pictures.
+"""
+
+import os
+import sys
+import logging
+import threading
+import time
+import itertools
+from collections import Counter
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from security import verify_token
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames that mean a thread is idle
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+def profiling_configured() -> bool:
+    """Whether any requests are profiled (on demand or every Nth)"""
+    return settings.PROFILING_ENABLED or settings.PROFILE_EVERY_N > 0
+
+
+def _authenticated(headers: dict) -> bool:
+    """Whether the request carries a valid bearer token (signature check only, no DB)"""
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    return scheme.lower() == "bearer" and verify_token(token) is not None
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """Samples all thread stacks at a fixed interval"""
+
+    def __init__(self, interval_ms: float = 1.0):
+        """
+        Args:
+            interval_ms: Sampling interval in milliseconds
+        """
+        self.interval = interval_ms / 1000.0
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(own_id)
+
+    def sample(self, own_id: Optional[int] = None):
+        """Record the current stack of every busy thread"""
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        """Profile in the collapsed-stack format"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests on demand or every Nth request"""
+
+    def __init__(self, app):
+        self.app = app
+        self._counter = itertools.count(1)
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+
+    def _should_profile(self, scope) -> bool:
+        if settings.PROFILE_EVERY_N > 0 and next(self._counter) % settings.PROFILE_EVERY_N == 0:
+            return True
+        if not settings.PROFILING_ENABLED:
+            return False
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile", b"").lower() not in (b"1", b"true", b"yes"):
+            return False
+        # Sampling every thread costs the whole worker, so anonymous clients cannot ask for it
+        return _authenticated(headers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(settings.PROFILE_INTERVAL_MS)
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{os.getpid()}-{id(profiler):x}"
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode())
+                ]
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            # Joining the sampler and writing the file block, keep both off the event loop
+            await run_in_threadpool(profiler.stop)
+            await run_in_threadpool(self._write, profile_id, scope, profiler)
+
+    @staticmethod
+    def _write(profile_id: str, scope, profiler: SamplingProfiler):
+        path = os.path.join(settings.PROFILE_DIR, f"{profile_id}.collapsed")
+        with open(path, "w") as f:
+            f.write(profiler.collapsed())
+        logger.info(
+            "Profiled %s %s: %.1fms, %d samples -> %s",
+            scope["method"], scope["path"], profiler.duration * 1000, profiler.samples, path
+        )
+        prune_profiles(settings.PROFILE_MAX_FILES)
+
+
+def prune_profiles(max_files: int):
+    """Delete the oldest stored profiles beyond ``max_files``"""
+    paths = [
+        entry.path for entry in os.scandir(settings.PROFILE_DIR)
+        if entry.is_file() and entry.name.endswith(".collapsed")
+    ]
+    if len(paths) <= max_files:
+        return
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:len(paths) - max(0, max_files)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Pruned concurrently by another request or worker
+            pass
+
+
+def read_profile(profile_id: str) -> Optional[str]:
+    """Read a stored profile, None if it does not exist"""
+    name = os.path.basename(profile_id)
+    path = os.path.join(settings.PROFILE_DIR, f"{name}.collapsed")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read()
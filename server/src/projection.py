@@ -0,0 +1,108 @@
+"""
+Sparse fieldsets for patient responses
+
+``?fields=id,lung_cancer,prediction_confidence`` selects only the columns
+backing the requested fields and serializes only those fields. The name
+ciphertext columns are selected and decrypted only when ``name`` is
+requested, so risk-only views skip decryption entirely.
+"""
+
+import hashlib
+from typing import Optional
+
+from db.models import PatientData
+
+# Fields of PatientDataResponse, in response order
+PATIENT_FIELDS = [
+    "id", "name", "age", "biological_gender", "smoking", "yellow_fingers", "anxiety",
+    "peer_pressure", "chronic_disease", "fatigue", "allergy", "wheezing", "alcohol",
+    "coughing", "shortness_of_breath", "swallowing_difficulty", "chest_pain",
+    "lung_cancer", "prediction_confidence", "prediction_status", "doctor_id",
+    "created_at", "updated_at"
+]
+
+DATETIME_FIELDS = {"created_at", "updated_at"}
+
+
+def parse_fields(fields: Optional[str]) -> list[str]:
+    """
+    Parse a ``fields`` query parameter
+
+    Args:
+        fields: Comma-separated field names, None or empty for all fields
+
+    Returns:
+        list: Requested fields in response order, always including "id"
+
+    Raises:
+        ValueError: If a field name is unknown
+    """
+    if not fields:
+        return list(PATIENT_FIELDS)
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested.difference(PATIENT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    requested.add("id")
+    return [field for field in PATIENT_FIELDS if field in requested]
+
+
+def patient_columns(fields: list[str]) -> list:
+    """
+    Columns to SELECT for a fieldset (plus ``version`` for the ETag)
+
+    Args:
+        fields: Fields as returned by parse_fields
+
+    Returns:
+        list: PatientData column attributes
+    """
+    columns = [PatientData.version]
+    for field in fields:
+        if field == "name":
+            columns += [PatientData.name_ciphertext, PatientData.name_encrypted]
+        else:
+            columns.append(getattr(PatientData, field))
+    return columns
+
+
+def serialize_patient(row, fields: list[str]) -> dict:
+    """
+    Serialize a row selected with patient_columns
+
+    Args:
+        row: Result row
+        fields: Fields as returned by parse_fields
+
+    Returns:
+        dict: JSON-ready patient with only the requested fields
+    """
+    data = {}
+    for field in fields:
+        if field == "name":
+            data["name"] = PatientData.decrypt_name(row.name_ciphertext, row.name_encrypted)
+        elif field in DATETIME_FIELDS:
+            value = getattr(row, field)
+            data[field] = value.isoformat() if value else None
+        else:
+            data[field] = getattr(row, field)
+    return data
+
+
+def projected_etag(etag: str, fields: list[str]) -> str:
+    """
+    Make an ETag specific to a fieldset
+
+    Args:
+        etag: ETag of the full representation
+        fields: Fields as returned by parse_fields
+
+    Returns:
+        str: ``etag`` unchanged for all fields, otherwise tagged with the fieldset
+    """
+    if fields == PATIENT_FIELDS:
+        return etag
+    digest = hashlib.sha1(",".join(fields).encode()).hexdigest()[:8]
+    return f'{etag[:-1]}.f{digest}"'
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Re-encrypt patient names with the current encryption key and format
+
+Walks patient_data in primary-key chunks and, across a process pool,
+rewrites every name that is not yet in the compact binary format under the
+current ENCRYPTION_KEY_VERSION:
+
+    * binary ciphertexts with an older key version are re-encrypted
+    * legacy base64(Fernet) names are converted to the binary format
+
+Every chunk is written back with a single UPDATE statement that only
+applies to rows whose name is still the one that was read, so a name
+changed meanwhile by the API is never overwritten. Progress is checkpointed
+after each committed chunk, so an interrupted run resumes where it stopped;
+the checkpoint is removed when a run completes and ignored if it was
+written for another key version.
+Rows already current are skipped, so re-running a chunk is harmless. Ids
+that could not be decrypted are appended to ``<checkpoint>.failed``.
+
+Usage:
+    # After rotating: set the new ENCRYPTION_PASSWORD/SALT and bump ENCRYPTION_KEY_VERSION
+    OLD_ENCRYPTION_PASSWORD=... OLD_ENCRYPTION_SALT=... python rotate_keys.py \\
+        --old-key-version 1 [--chunk-size 5000] [--workers N]
+
+    # Only convert legacy names to the binary format (no key change)
+    python rotate_keys.py
+"""
+
+import sys
+import os
+import json
+import time
+import base64
+import binascii
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from sqlalchemy import select, update, or_, bindparam, values, column, cast, Integer, String, LargeBinary
+
+from config import settings
+from db.database import Engine
+from db.models import PatientData
+from encryption import check_key_version, derive_key, derive_aes_key, get_encryption_key, encrypt_with_key, decrypt_with_keyring
+
+# Per-process keys, set by init_worker
+_keyring: dict[int, AESGCM] = {}
+_fernets: list[Fernet] = []
+_current_version = 0
+
+def init_worker(keys: dict[int, bytes], current_version: int):
+    """
+    Create the cipher instances once per worker process
+
+    Args:
+        keys: Fernet keys by key version (AES-GCM keys are derived from them)
+        current_version: Key version to encrypt with
+    """
+    global _keyring, _fernets, _current_version
+    _keyring = {version: derive_aes_key(key, version) for version, key in keys.items()}
+    _fernets = [Fernet(key) for key in keys.values()]
+    _current_version = current_version
+
+def _decrypt_legacy(encrypted_text: Optional[str]) -> Optional[str]:
+    if encrypted_text is None:
+        return None
+    try:
+        token = base64.b64decode(encrypted_text.encode(), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    for fernet in _fernets:
+        try:
+            return fernet.decrypt(token).decode()
+        except InvalidToken:
+            continue
+    return None
+
+def reencrypt_chunk(rows: list[tuple]) -> tuple[list[dict], int, list[int]]:
+    """
+    Re-encrypt one chunk of names
+
+    Args:
+        rows: (id, name_encrypted, name_ciphertext) tuples
+
+    Returns:
+        tuple: (updates as {"row_id", "old_encrypted", "old_ciphertext", "ciphertext"}
+               dicts, number of rows already current, ids that could not be decrypted)
+    """
+    updates, already_current, failed = [], 0, []
+    current = _keyring[_current_version]
+    for row_id, encrypted_text, ciphertext in rows:
+        if ciphertext is not None:
+            ciphertext = bytes(ciphertext)
+            # Empty names are stored as b"" and carry no key version
+            if not ciphertext or ciphertext[0] == _current_version:
+                already_current += 1
+                continue
+            try:
+                plaintext = decrypt_with_keyring(ciphertext, _keyring)
+            except Exception:
+                failed.append(row_id)
+                continue
+        else:
+            plaintext = _decrypt_legacy(encrypted_text)
+            if plaintext is None:
+                failed.append(row_id)
+                continue
+        updates.append({
+            "row_id": row_id,
+            "old_encrypted": encrypted_text,
+            "old_ciphertext": ciphertext,
+            "ciphertext": encrypt_with_key(plaintext, current, _current_version)
+        })
+    return updates, already_current, failed
+
+def write_updates(conn, updates: list[dict]) -> int:
+    """
+    Write one chunk of new ciphertexts with a single statement where supported
+
+    Each row is only updated if its name columns still hold the values that
+    were re-encrypted (compare-and-set), so concurrent edits win.
+
+    Returns:
+        int: Number of rows written
+    """
+    table = PatientData.__table__
+    if conn.dialect.name == "postgresql":
+        # UPDATE patient_data SET ... FROM (VALUES ...) AS v (row_id, old_encrypted, old_ciphertext, ciphertext)
+        # WHERE id = v.row_id AND name_encrypted IS NOT DISTINCT FROM v.old_encrypted AND ...
+        new_values = values(
+            column("row_id", Integer),
+            column("old_encrypted", String),
+            column("old_ciphertext", LargeBinary),
+            column("ciphertext", LargeBinary),
+            name="v"
+        ).data([(u["row_id"], u["old_encrypted"], u["old_ciphertext"], u["ciphertext"]) for u in updates])
+        result = conn.execute(
+            update(table)
+            .where(
+                table.c.id == new_values.c.row_id,
+                table.c.name_encrypted.is_not_distinct_from(new_values.c.old_encrypted),
+                # An all-NULL VALUES column is typed text
+                table.c.name_ciphertext.is_not_distinct_from(cast(new_values.c.old_ciphertext, LargeBinary))
+            )
+            .values(name_ciphertext=new_values.c.ciphertext, name_encrypted=None)
+        )
+    else:
+        result = conn.execute(
+            update(table)
+            .where(
+                table.c.id == bindparam("row_id"),
+                table.c.name_encrypted.is_not_distinct_from(bindparam("old_encrypted")),
+                table.c.name_ciphertext.is_not_distinct_from(bindparam("old_ciphertext"))
+            )
+            .values(name_ciphertext=bindparam("ciphertext"), name_encrypted=None),
+            updates
+        )
+    return result.rowcount
+
+def load_checkpoint(path: str, key_version: int) -> dict:
+    """
+    Load the checkpoint of an interrupted run towards ``key_version``
+
+    A checkpoint written for another key version belongs to an earlier
+    rotation, so the run starts over.
+    """
+    if os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("key_version") == key_version:
+            return checkpoint
+    return {
+        "key_version": key_version, "last_id": 0,
+        "rotated": 0, "already_current": 0, "changed": 0, "failed": 0
+    }
+
+def record_failures(path: str, failed: list[int]):
+    """Append ids that could not be decrypted to ``<checkpoint>.failed``, one per line"""
+    with open(f"{path}.failed", "a") as f:
+        f.writelines(f"{row_id}\n" for row_id in failed)
+
+def save_checkpoint(path: str, checkpoint: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def read_chunks(last_id: int, chunk_size: int):
+    """Yield (id, name_encrypted, name_ciphertext) chunks in primary-key order after ``last_id``"""
+    table = PatientData.__table__
+    has_name = or_(
+        table.c.name_ciphertext.isnot(None),
+        (table.c.name_encrypted.isnot(None)) & (table.c.name_encrypted != "")
+    )
+    while True:
+        with Engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.name_encrypted, table.c.name_ciphertext)
+                .where(table.c.id > last_id, has_name)
+                .order_by(table.c.id)
+                .limit(chunk_size)
+            ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [tuple(row) for row in rows]
+
+def rotate_keys(
+    old_password: Optional[str],
+    old_salt: Optional[str],
+    old_key_version: Optional[int],
+    chunk_size: int,
+    workers: Optional[int],
+    checkpoint_path: str
+) -> dict:
+    """
+    Run (or resume) the re-encryption job
+
+    The checkpoint is removed once every chunk is committed, so the next
+    run (e.g. after the next key rotation) starts from the beginning.
+
+    Returns:
+        dict: Final checkpoint with counters; failed ids are listed in ``<checkpoint_path>.failed``
+    """
+    current_version = settings.ENCRYPTION_KEY_VERSION
+    keys = {
+        version: derive_key(password, salt)
+        for version, (password, salt) in settings.ENCRYPTION_PREVIOUS_KEYS.items()
+    }
+    if old_password and old_salt:
+        if old_key_version is None or old_key_version == current_version:
+            raise ValueError("--old-key-version must differ from ENCRYPTION_KEY_VERSION")
+        keys[old_key_version] = derive_key(old_password, old_salt)
+    keys[current_version] = get_encryption_key()
+    for version in keys:
+        check_key_version(version)
+
+    checkpoint = load_checkpoint(checkpoint_path, current_version)
+    if checkpoint["last_id"]:
+        print(f"🔁 Resuming after patient id {checkpoint['last_id']}")
+    elif os.path.exists(f"{checkpoint_path}.failed"):
+        # Failures of a previous, completed run
+        os.remove(f"{checkpoint_path}.failed")
+
+    started = time.perf_counter()
+    processed = 0
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(keys, current_version)) as executor:
+        in_flight = deque()
+
+        def commit_oldest():
+            nonlocal processed
+            last_id, size, future = in_flight.popleft()
+            updates, already_current, failed = future.result()
+            written = 0
+            if updates:
+                with Engine.begin() as conn:
+                    written = write_updates(conn, updates)
+            if failed:
+                record_failures(checkpoint_path, failed)
+
+            # Chunks are committed in order, so everything up to last_id is done
+            checkpoint["last_id"] = last_id
+            checkpoint["rotated"] += written
+            checkpoint["already_current"] += already_current
+            # Names edited since they were read were written with the current key by the API
+            checkpoint["changed"] += len(updates) - written
+            checkpoint["failed"] += len(failed)
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            processed += size
+            rate = processed / (time.perf_counter() - started)
+            print(f"   ✅ up to id {last_id}: {checkpoint['rotated']} rewritten, {rate:,.0f} rows/s")
+
+        for chunk in read_chunks(checkpoint["last_id"], chunk_size):
+            in_flight.append((chunk[-1][0], len(chunk), executor.submit(reencrypt_chunk, chunk)))
+            if len(in_flight) >= workers * 2:
+                commit_oldest()
+
+        while in_flight:
+            commit_oldest()
+
+    # Completed: only an interrupted run is resumed
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return checkpoint
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-encrypt patient names with the current encryption key")
+    parser.add_argument("--old-password", default=os.getenv("OLD_ENCRYPTION_PASSWORD"))
+    parser.add_argument("--old-salt", default=os.getenv("OLD_ENCRYPTION_SALT"))
+    parser.add_argument("--old-key-version", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--checkpoint", default="rotate_keys.checkpoint.json")
+    args = parser.parse_args()
+
+    print("🔑 MECHA-LUNG Key Rotation")
+    print("=" * 40)
+
+    if not settings.ENCRYPTION_SALT:
+        print("❌ ENCRYPTION_SALT not set. Please check your .env file")
+        sys.exit(1)
+
+    try:
+        checkpoint = rotate_keys(
+            args.old_password, args.old_salt, args.old_key_version,
+            args.chunk_size, args.workers, args.checkpoint
+        )
+    except Exception as e:
+        print(f"❌ Key rotation stopped: {e}")
+        print("   Re-run the same command to resume from the last checkpoint.")
+        sys.exit(1)
+
+    print(f"\n🎉 Rewrote {checkpoint['rotated']} names "
+          f"({checkpoint['already_current']} already current, {checkpoint['changed']} changed meanwhile)")
+    if checkpoint["failed"]:
+        print(f"⚠️  {checkpoint['failed']} names could not be decrypted, ids listed in {args.checkpoint}.failed")
+
+if __name__ == "__main__":
+    main()
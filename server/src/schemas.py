@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List, Annotated
 
 # Doctor Schemas
 class DoctorCreate(BaseModel):
@@ -63,10 +63,38 @@ class PatientDataResponse(BaseModel):
     shortness_of_breath: bool
     swallowing_difficulty: bool
     chest_pain: bool
-    lung_cancer: bool
+    lung_cancer: Optional[bool]  # None while the prediction is pending
     prediction_confidence: Optional[float]
+    prediction_status: str = "done"  # "pending", "done" or "failed"
     doctor_id: int
     created_at: Optional[str]
+    updated_at: Optional[str] = None
+
+class PatientDataFields(BaseModel):
+    """Schema for a patient response selected with ?fields= (only requested fields are present)"""
+    id: int
+    name: Optional[str] = None
+    age: Optional[int] = None
+    biological_gender: Optional[bool] = None
+    smoking: Optional[bool] = None
+    yellow_fingers: Optional[bool] = None
+    anxiety: Optional[bool] = None
+    peer_pressure: Optional[bool] = None
+    chronic_disease: Optional[bool] = None
+    fatigue: Optional[bool] = None
+    allergy: Optional[bool] = None
+    wheezing: Optional[bool] = None
+    alcohol: Optional[bool] = None
+    coughing: Optional[bool] = None
+    shortness_of_breath: Optional[bool] = None
+    swallowing_difficulty: Optional[bool] = None
+    chest_pain: Optional[bool] = None
+    lung_cancer: Optional[bool] = None
+    prediction_confidence: Optional[float] = None
+    prediction_status: Optional[str] = None
+    doctor_id: Optional[int] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
 
 class PatientDataUpdate(BaseModel):
     """Schema for updating patient data"""
@@ -87,6 +115,82 @@ class PatientDataUpdate(BaseModel):
     swallowing_difficulty: Optional[bool] = None
     chest_pain: Optional[bool] = None
 
+class PatientBulkUpdate(BaseModel):
+    """Schema for applying the same changes to many patients"""
+    ids: List[int]
+    changes: PatientDataUpdate
+
+class PatientBulkDelete(BaseModel):
+    """Schema for deleting many patients"""
+    ids: List[int]
+
+class PredictionStatus(BaseModel):
+    """Schema for a patient's prediction status"""
+    patient_id: int
+    prediction_status: str
+    lung_cancer: Optional[bool]
+    prediction_confidence: Optional[float]
+
+class FeatureContribution(BaseModel):
+    """Contribution of one feature to a prediction"""
+    feature: str
+    value: float
+    contribution: float
+
+class PatientExplanation(BaseModel):
+    """Schema for a prediction explanation"""
+    patient_id: int
+    base_value: float  # Average predicted risk over the training data
+    risk: float  # Predicted lung cancer probability
+    contributions: List[FeatureContribution]  # Sorted by absolute impact
+
+# What-If Schemas
+# Ages fed to the model in what-if scenarios
+WhatIfAge = Annotated[int, Field(ge=0, le=120)]
+
+class WhatIfChanges(PatientDataUpdate):
+    """Feature changes of a what-if scenario"""
+    age: Optional[WhatIfAge] = None
+
+class WhatIfScenario(BaseModel):
+    """A user-specified combination of feature changes"""
+    name: Optional[str] = None
+    changes: WhatIfChanges  # Only model features are used
+
+class PatientWhatIfRequest(BaseModel):
+    """Schema for requesting counterfactual risk scenarios"""
+    toggles: bool = True  # Flip every symptom one at a time
+    ages: List[WhatIfAge] = Field(default=[], max_length=50)  # Age sweep
+    scenarios: List[WhatIfScenario] = []
+
+class WhatIfResult(BaseModel):
+    """Risk of one counterfactual scenario"""
+    scenario: str
+    changes: dict
+    risk: float  # Predicted lung cancer probability
+    delta: float  # Change against the patient's current risk
+    lung_cancer: bool
+
+class PatientWhatIf(BaseModel):
+    """Schema for counterfactual risk scenarios"""
+    patient_id: int
+    risk: float  # Current predicted lung cancer probability
+    scenarios: List[WhatIfResult]  # Sorted by absolute delta
+
+# Audit Log Schemas
+class AuditLogEntry(BaseModel):
+    """Schema for an audit log entry"""
+    id: int
+    occurred_at: str
+    doctor_id: int
+    action: str
+    patient_id: Optional[int]
+
+class AuditLogPage(BaseModel):
+    """Schema for a page of audit log entries"""
+    entries: List[AuditLogEntry]  # Newest first
+    next_before: Optional[int]  # Pass as ?before= for the next page, None on the last page
+
 # Authentication Schemas
 class Token(BaseModel):
     """Schema for authentication token"""
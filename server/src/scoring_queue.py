@@ -0,0 +1,249 @@
+"""
+Deferred asynchronous scoring
+
+With DEFERRED_SCORING enabled, patients are stored with
+``prediction_status="pending"`` and their ids are queued here. Background
+worker threads drain the queue in batches, score each batch with one
+vectorized call and write ``lung_cancer``/``prediction_confidence`` back.
+
+Rows left pending by a stopped worker, and rows whose scoring failed, are
+claimed and re-queued on startup and then every SCORING_LEASE_SECONDS.
+Only rows untouched for a full lease are claimed, and claiming refreshes
+``updated_at`` and bumps ``version``, so with several server workers each
+row is re-queued by one of them only.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import update, bindparam, or_
+
+from config import settings
+from db.database import SessionLocal
+from db.models import PatientData
+from metrics import metrics
+from ml.predict import FEATURE_FIELDS, predict_batch
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class DeferredScorer:
+    """In-process scoring queue drained by a pool of worker threads"""
+
+    def __init__(self, workers: int = 1, batch_size: int = 64, max_wait_ms: float = 50,
+                 lease_seconds: float = 60):
+        """
+        Args:
+            workers: Number of scoring threads
+            batch_size: Maximum rows scored per batch
+            max_wait_ms: Maximum time a worker waits to fill a batch
+            lease_seconds: Age after which pending or failed rows are claimed and re-queued
+        """
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.lease = max(1.0, lease_seconds)
+        self._queue: queue.Queue = queue.Queue()
+        self._threads: list[threading.Thread] = []
+        self._recovery: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        # Incremented after every written batch; long-polls watch it
+        self.completed_batches = 0
+
+        metrics.describe("scoring_queue_depth", "Patients waiting for deferred scoring")
+        metrics.describe("scoring_queue_lag_seconds", "Age of the oldest queued patient")
+        metrics.describe("scoring_rows_total", "Patients scored by the deferred scorer")
+        metrics.gauge_callback("scoring_queue_depth", self.depth)
+        metrics.gauge_callback("scoring_queue_lag_seconds", self.lag)
+
+    def start(self):
+        """Start the worker threads and the periodic recovery of stale rows"""
+        self._stopping.clear()
+        self.recover_pending()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"deferred-scorer-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        self._recovery = threading.Thread(target=self._recover_periodically, name="deferred-scorer-recovery", daemon=True)
+        self._recovery.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Finish queued work (up to ``timeout`` seconds) and stop the workers"""
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._recovery is not None:
+            self._recovery.join(timeout)
+            self._recovery = None
+
+    def enqueue(self, patient_id: int, version: int, patient_data: dict):
+        """
+        Queue a stored patient for scoring
+
+        Args:
+            patient_id: Patient primary key
+            version: Row version the features belong to
+            patient_data: Dictionary containing patient symptoms and data (and doctor_id)
+        """
+        features = {field: patient_data[field] for field in FEATURE_FIELDS}
+        self._queue.put((patient_id, patient_data["doctor_id"], version, features, time.monotonic()))
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def lag(self) -> float:
+        """Seconds the oldest queued patient has been waiting"""
+        with self._queue.mutex:
+            for item in self._queue.queue:
+                if item is not None:
+                    return time.monotonic() - item[-1]
+        return 0.0
+
+    def recover_pending(self) -> int:
+        """
+        Claim and queue rows left pending by a stopped worker or whose scoring failed
+
+        Returns:
+            int: Number of re-queued patients
+        """
+        table = PatientData.__table__
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            # Rows touched within the lease are still owned by the worker that queued them.
+            # The claim bumps the version, so a copy still sitting in another queue is skipped
+            # by the version guard in _score, and a concurrent claim sees the fresh updated_at.
+            rows = db.execute(
+                update(table)
+                .where(
+                    table.c.prediction_status.in_([PENDING, FAILED]),
+                    or_(table.c.updated_at < now - timedelta(seconds=self.lease), table.c.updated_at.is_(None))
+                )
+                .values(prediction_status=PENDING, updated_at=now, version=table.c.version + 1)
+                .returning(
+                    table.c.id,
+                    table.c.doctor_id,
+                    table.c.version,
+                    *[table.c[field] for field in FEATURE_FIELDS]
+                )
+            ).all()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Claiming patients pending deferred scoring failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+        for row in rows:
+            self.enqueue(row.id, row.version, dict(row._mapping))
+        if rows:
+            print(f"Re-queued {len(rows)} patients pending deferred scoring")
+        return len(rows)
+
+    def _recover_periodically(self):
+        while not self._stopping.wait(self.lease):
+            self.recover_pending()
+
+    def _next_batch(self) -> tuple[list, bool]:
+        """Block for the next batch; returns (batch, stop_requested)"""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if batch:
+                self._score(batch)
+
+    def _score(self, batch: list):
+        try:
+            predictions = predict_batch([features for _, _, _, features, _ in batch])
+            rows = [
+                {
+                    "row_id": patient_id, "row_doctor_id": doctor_id, "row_version": version,
+                    "risk": risk, "confidence": confidence, "status": DONE
+                }
+                for (patient_id, doctor_id, version, _, _), (risk, confidence) in zip(batch, predictions)
+            ]
+        except Exception as e:
+            print(f"Deferred scoring failed for {len(batch)} patients: {e}")
+            rows = [
+                {
+                    "row_id": patient_id, "row_doctor_id": doctor_id, "row_version": version,
+                    "risk": None, "confidence": None, "status": FAILED
+                }
+                for patient_id, doctor_id, version, _, _ in batch
+            ]
+
+        table = PatientData.__table__
+        db = SessionLocal()
+        try:
+            # Rows changed since they were queued are skipped; their newer version is queued too.
+            # doctor_id lets a partitioned patient_data prune to one partition.
+            db.execute(
+                update(table)
+                .where(
+                    table.c.id == bindparam("row_id"),
+                    table.c.doctor_id == bindparam("row_doctor_id"),
+                    table.c.version == bindparam("row_version")
+                )
+                .values(
+                    lung_cancer=bindparam("risk"),
+                    prediction_confidence=bindparam("confidence"),
+                    prediction_status=bindparam("status"),
+                    version=table.c.version + 1
+                ),
+                rows
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Writing deferred scores failed: {e}")
+            return
+        finally:
+            db.close()
+
+        metrics.inc("scoring_rows_total", len(rows))
+        self.completed_batches += 1
+
+
+_scorer: Optional[DeferredScorer] = None
+
+
+def get_scorer() -> DeferredScorer:
+    """Get the process-wide deferred scorer configured from settings"""
+    global _scorer
+    if _scorer is None:
+        _scorer = DeferredScorer(
+            workers=settings.SCORING_WORKERS,
+            batch_size=settings.SCORING_BATCH_SIZE,
+            max_wait_ms=settings.SCORING_MAX_WAIT_MS,
+            lease_seconds=settings.SCORING_LEASE_SECONDS
+        )
+    return _scorer
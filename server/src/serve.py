@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the MECHA-LUNG API
+
+Imports the app once in the parent process (model unpickling, key
+derivation, explainer tables), then forks WORKERS uvicorn workers that
+share the listening socket and the preloaded memory copy-on-write. Each
+worker warms up in the background after it starts (``/ready`` answers 503
+until then), and the parent restarts workers that die.
+
+Run from the repository root:
+    WORKERS=4 python server/src/serve.py
+"""
+
+import sys
+import os
+import gc
+import signal
+import socket
+import time
+import traceback
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import uvicorn
+
+from config import settings
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Create the listening socket shared by all workers"""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+# Exit code of a worker whose app failed to start (as uvicorn's own CLI uses)
+STARTUP_FAILURE = 3
+
+
+def run_worker(app, sock: socket.socket) -> int:
+    """
+    Serve requests in a forked worker; warmup starts in the app's lifespan
+
+    Returns:
+        int: Exit code for the worker process
+    """
+    from db.database import Engine
+
+    # Connections opened by the parent must not be shared across processes
+    Engine.dispose(close=False)
+
+    config = uvicorn.Config(app, log_level="info", access_log=False)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    # Depending on the version, uvicorn exits or returns when the lifespan startup fails
+    return 0 if server.started else STARTUP_FAILURE
+
+
+def spawn_worker(app, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 1
+        try:
+            code = run_worker(app, sock)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    print("🚀 MECHA-LUNG API server")
+    print("=" * 40)
+
+    # Preload before forking so workers share model and keys copy-on-write
+    started = time.perf_counter()
+    import main as app_module
+    from warmup import preload
+    from db.database import Engine
+    preload()
+    Engine.dispose()
+    print(f"✅ Preloaded app in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    # Keep preloaded objects out of the collector so it doesn't dirty shared pages
+    gc.freeze()
+
+    sock = bind_socket(settings.HOST, settings.PORT)
+    print(f"🌐 Listening on http://{settings.HOST}:{settings.PORT} with {settings.WORKERS} workers")
+
+    workers = {spawn_worker(app_module.app, sock) for _ in range(settings.WORKERS)}
+    shutting_down = False
+
+    def shutdown(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not shutting_down:
+            print(f"⚠️  Worker {pid} exited with code {os.waitstatus_to_exitcode(status)}, restarting")
+            time.sleep(1)
+            workers.add(spawn_worker(app_module.app, sock))
+
+    sock.close()
+    print("👋 Server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Worker warmup and readiness
+
+The first requests of a fresh worker would otherwise pay for lazy sklearn
+code paths, key derivation and opening database connections. ``warmup``
+runs all of these once; ``start_warmup`` runs it in a background thread as
+the worker starts, and ``/ready`` answers 503 until it has finished, so a
+load balancer only routes traffic to warm workers.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from config import settings
+from db.database import Engine
+from encryption import encrypt_bytes, decrypt_bytes, get_keyring
+from ml.batcher import get_batcher
+from ml.explain import get_explainer
+from ml.predict import FEATURE_FIELDS, predict_batch
+
+_ready = threading.Event()
+
+# Representative patient used for warmup predictions
+WARMUP_PATIENT = {field: False for field in FEATURE_FIELDS}
+WARMUP_PATIENT["age"] = 60
+
+
+def preload():
+    """Load everything that can be shared copy-on-write between forked workers"""
+    get_keyring()
+    get_explainer()
+
+
+def prime_db_pool(connections: int):
+    """Open ``connections`` pooled database connections concurrently"""
+    if connections <= 0:
+        return
+
+    def ping(_):
+        with Engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            # Hold the connection until every thread has one
+            time.sleep(0.05)
+
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        list(executor.map(ping, range(connections)))
+
+
+def warmup():
+    """Run the warmup routine and mark this worker ready"""
+    started = time.perf_counter()
+
+    preload()
+    # Start the batcher thread and run the model once, leaving the drift sketches
+    # alone: they already hold the predictions served while warming up
+    get_batcher()
+    predict_batch([WARMUP_PATIENT], record=False)
+    decrypt_bytes(encrypt_bytes("warmup"))
+    prime_db_pool(settings.DB_POOL_PRIME_CONNECTIONS)
+
+    _ready.set()
+    print(f"Worker warm in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+
+def start_warmup() -> threading.Thread:
+    """Run warmup in a background thread; a failed warmup leaves the worker not ready"""
+    def run():
+        try:
+            warmup()
+        except Exception as e:
+            print(f"Worker warmup failed: {e!r}")
+
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
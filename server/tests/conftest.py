@@ -0,0 +1,68 @@
+"""
+Shared fixtures: the API on a scratch SQLite database
+
+Settings are read from the environment at import time, so the test
+configuration is set before any server module is imported. Audit events
+are disabled so query counts only cover the endpoint's own statements.
+"""
+
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="mecha-lung-tests-"), "test.db")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("ENCRYPTION_SALT", "dV/7eHOI3szZ16tj614JNQ==")
+os.environ["AUDIT_ENABLED"] = "false"
+os.environ["DEFERRED_SCORING"] = "false"
+os.environ["ADMISSION_CONTROL_ENABLED"] = "false"
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "server", "src"))
+# The model is loaded from a path relative to the repository root
+os.chdir(REPO_ROOT)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from ml.predict import FEATURE_FIELDS
+
+PASSWORD = "test-password"
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_headers(client, request):
+    """Register and log in a fresh doctor for each test"""
+    user_name = f"dr_{request.node.name}"[:60]
+    client.post("/api/doctors/register", json={"user_name": user_name, "password": PASSWORD})
+    response = client.post("/api/doctors/login", json={"user_name": user_name, "password": PASSWORD})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def make_patient(**overrides) -> dict:
+    """Patient payload with every feature set"""
+    patient = {field: False for field in FEATURE_FIELDS}
+    patient.update(name="Naruto Uzumaki", age=60)
+    patient.update(overrides)
+    return patient
+
+
+@pytest.fixture
+def create_patients(client, auth_headers):
+    """Create ``count`` patients for the test's doctor, returns their ids"""
+    def create(count: int, **overrides) -> list[int]:
+        ids = []
+        for i in range(count):
+            response = client.post("/api/patients", json=make_patient(smoking=i % 2 == 0, **overrides), headers=auth_headers)
+            assert response.status_code == 200
+            ids.append(response.json()["id"])
+        return ids
+    return create
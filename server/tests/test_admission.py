@@ -0,0 +1,103 @@
+"""
+Admission control route classes and gates
+"""
+
+import asyncio
+
+import pytest
+
+from admission import AdmissionControlMiddleware, AdmissionGate, classify_request
+from config import settings
+
+
+@pytest.mark.parametrize("method, path, route_class", [
+    ("GET", "/ready", None),
+    ("OPTIONS", "/api/patients", None),
+    ("POST", "/api/doctors/login", "auth"),
+    ("GET", "/api/patients", "read"),
+    ("GET", "/api/patients/7", "read"),
+    ("GET", "/api/patients/7/prediction", "poll"),
+    ("DELETE", "/api/patients/7", "write"),
+    ("POST", "/api/patients/bulk-delete", "write"),
+    ("POST", "/api/patients", "ml"),
+    ("PUT", "/api/patients/7", "ml"),
+    ("GET", "/api/patients/7/explain", "ml"),
+])
+def test_classify_request(method, path, route_class):
+    assert classify_request(method, path) == route_class
+
+
+def test_gate_admits_up_to_limit_then_queues_in_order():
+    async def scenario():
+        gate = AdmissionGate("read", limit=1, max_queue=2, timeout=1.0)
+        assert await gate.acquire() is None
+
+        admitted = []
+
+        async def wait(name):
+            assert await gate.acquire() is None
+            admitted.append(name)
+
+        waiters = [asyncio.create_task(wait("first")), asyncio.create_task(wait("second"))]
+        await asyncio.sleep(0)
+        assert gate.queue_depth == 2
+        # Queue is full
+        assert await gate.acquire() == "queue_full"
+
+        gate.release()
+        await asyncio.sleep(0.01)
+        assert admitted == ["first"]
+        gate.release()
+        await asyncio.gather(*waiters)
+        assert admitted == ["first", "second"]
+        gate.release()
+        assert gate.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_gate_times_out_waiters():
+    async def scenario():
+        gate = AdmissionGate("ml", limit=1, max_queue=1, timeout=0.05)
+        assert await gate.acquire() is None
+        assert await gate.acquire() == "timeout"
+        assert gate.queue_depth == 0
+        gate.release()
+        assert gate.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_middleware_rejects_with_retry_after():
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def request(middleware):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/api/patients", "headers": []}
+        await middleware(scope, None, send)
+        return messages[0]
+
+    async def scenario():
+        middleware = AdmissionControlMiddleware(slow_app, limits={"read": 1})
+        for gate in middleware.gates.values():
+            gate.max_queue = 0
+
+        admitted = asyncio.create_task(request(middleware))
+        await asyncio.sleep(0)
+        rejected = await request(middleware)
+        release.set()
+
+        assert (await admitted)["status"] == 200
+        assert rejected["status"] == 503
+        assert (b"retry-after", str(settings.ADMISSION_RETRY_AFTER_SECONDS).encode()) in rejected["headers"]
+
+    asyncio.run(scenario())
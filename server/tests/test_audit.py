@@ -0,0 +1,68 @@
+"""
+Audit log of patient access
+"""
+
+import pytest
+from sqlalchemy import func, select
+
+from audit import AuditWriter
+from config import settings
+from db.database import Engine
+from db.models import AuditLog
+
+
+@pytest.fixture
+def audit_enabled(monkeypatch):
+    # Without a started writer thread, events are written synchronously
+    monkeypatch.setattr(settings, "AUDIT_ENABLED", True)
+
+
+def audit_entries(client, auth_headers, **params):
+    response = client.get("/api/audit", params=params, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()["entries"]
+
+
+def test_list_is_one_event_per_request(client, auth_headers, create_patients, audit_enabled):
+    create_patients(3)
+
+    etag = client.get("/api/patients", headers=auth_headers).headers["ETag"]
+    response = client.get("/api/patients", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    entries = audit_entries(client, auth_headers, action="list")
+    assert [entry["patient_id"] for entry in entries] == [None, None]
+
+
+def test_not_modified_read_is_audited(client, auth_headers, create_patients, audit_enabled):
+    patient_id, = create_patients(1)
+
+    etag = client.get(f"/api/patients/{patient_id}", headers=auth_headers).headers["ETag"]
+    client.get(f"/api/patients/{patient_id}", headers={**auth_headers, "If-None-Match": etag})
+
+    entries = audit_entries(client, auth_headers, action="read", patient_id=patient_id)
+    assert len(entries) == 2
+
+
+def test_writes_are_audited(client, auth_headers, create_patients, audit_enabled):
+    first, second = create_patients(2)
+    client.put(f"/api/patients/{first}", json={"age": 70}, headers=auth_headers)
+    client.post("/api/patients/bulk-delete", json={"ids": [first, second]}, headers=auth_headers)
+
+    actions = [(entry["action"], entry["patient_id"]) for entry in audit_entries(client, auth_headers)]
+    # Newest first; the bulk delete's entries share one timestamp
+    assert set(actions[:2]) == {("delete", first), ("delete", second)}
+    assert actions[2] == ("update", first)
+    assert ("create", first) in actions and ("create", second) in actions
+
+
+def test_writer_flushes_batches_on_stop():
+    doctor_id = 10 ** 6
+    writer = AuditWriter(batch_size=2, flush_interval_ms=10_000)
+    writer.start()
+    writer.record(doctor_id, "read", range(5))
+    writer.stop()
+
+    with Engine.connect() as conn:
+        count = conn.execute(select(func.count()).where(AuditLog.doctor_id == doctor_id)).scalar()
+    assert count == 5
@@ -0,0 +1,88 @@
+"""
+Micro-batching of concurrent prediction requests
+"""
+
+import threading
+
+import pytest
+
+from ml.batcher import PredictionBatcher
+
+
+class RecordingPredictor:
+    """predict_fn that records batch sizes and echoes each row's value"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, rows):
+        self.batches.append(len(rows))
+        return [row["value"] * 2 for row in rows]
+
+
+def submit_concurrently(batcher, values):
+    start = threading.Barrier(len(values))
+    futures = [None] * len(values)
+
+    def submit(i):
+        start.wait()
+        futures[i] = batcher.submit({"value": values[i]})
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(values))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return futures
+
+
+def test_concurrent_requests_share_a_batch():
+    predictor = RecordingPredictor()
+    batcher = PredictionBatcher(predict_fn=predictor, max_batch_size=64, max_wait_ms=200)
+    try:
+        futures = submit_concurrently(batcher, list(range(16)))
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        batcher.stop()
+
+    # Each caller gets its own row's result, however the rows were batched
+    assert results == [value * 2 for value in range(16)]
+    assert sum(predictor.batches) == 16
+    assert len(predictor.batches) < 16
+
+
+def test_batches_respect_max_size():
+    predictor = RecordingPredictor()
+    batcher = PredictionBatcher(predict_fn=predictor, max_batch_size=4, max_wait_ms=200)
+    try:
+        futures = submit_concurrently(batcher, list(range(10)))
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        batcher.stop()
+
+    assert max(predictor.batches) <= 4
+    assert sum(predictor.batches) == 10
+
+
+def test_predict_fn_error_reaches_every_caller():
+    def failing(rows):
+        raise RuntimeError("model unavailable")
+
+    batcher = PredictionBatcher(predict_fn=failing, max_wait_ms=50)
+    try:
+        futures = [batcher.submit({"value": i}) for i in range(3)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model unavailable"):
+                future.result(timeout=5)
+    finally:
+        batcher.stop()
+
+
+def test_stop_scores_queued_rows():
+    predictor = RecordingPredictor()
+    batcher = PredictionBatcher(predict_fn=predictor, max_wait_ms=50)
+    futures = [batcher.submit({"value": i}) for i in range(5)]
+    batcher.stop()
+
+    assert [future.result(timeout=0) for future in futures] == [0, 2, 4, 6, 8]
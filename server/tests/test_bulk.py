@@ -0,0 +1,71 @@
+"""
+Bulk update and bulk delete of patients
+"""
+
+import pytest
+
+from conftest import PASSWORD, make_patient
+from db.instrumentation import assert_max_queries
+
+
+@pytest.fixture
+def other_doctor_patient(client):
+    """A patient owned by another doctor"""
+    user_name = "dr_bulk_other"
+    client.post("/api/doctors/register", json={"user_name": user_name, "password": PASSWORD})
+    token = client.post("/api/doctors/login", json={"user_name": user_name, "password": PASSWORD}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    patient_id = client.post("/api/patients", json=make_patient(), headers=headers).json()["id"]
+    return patient_id, headers
+
+
+def test_bulk_update_changes_only_own_patients(client, auth_headers, create_patients, other_doctor_patient):
+    ids = create_patients(3, coughing=False)
+    other_id, other_headers = other_doctor_patient
+
+    response = client.patch(
+        "/api/patients/bulk", json={"ids": ids + [other_id], "changes": {"coughing": True}}, headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    updated = response.json()
+    assert sorted(patient["id"] for patient in updated) == ids
+    assert all(patient["coughing"] and patient["lung_cancer"] is not None for patient in updated)
+    assert client.get(f"/api/patients/{other_id}", headers=other_headers).json()["coughing"] is False
+
+
+@pytest.mark.parametrize("patients", [1, 10])
+def test_bulk_update_query_count_is_constant(client, auth_headers, create_patients, patients):
+    ids = create_patients(patients)
+
+    # Doctor lookup, UPDATE ... RETURNING, prediction write-back
+    with assert_max_queries(3):
+        response = client.patch("/api/patients/bulk", json={"ids": ids, "changes": {"fatigue": True}}, headers=auth_headers)
+
+    assert response.status_code == 200
+
+
+def test_bulk_update_without_changes_is_a_no_op(client, auth_headers, create_patients):
+    ids = create_patients(2)
+    etag = client.get("/api/patients", headers=auth_headers).headers["ETag"]
+
+    response = client.patch("/api/patients/bulk", json={"ids": ids, "changes": {}}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert sorted(patient["id"] for patient in response.json()) == ids
+    assert client.get("/api/patients", headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+
+def test_bulk_delete(client, auth_headers, create_patients, other_doctor_patient):
+    ids = create_patients(3)
+    other_id, other_headers = other_doctor_patient
+
+    response = client.post(
+        "/api/patients/bulk-delete", json={"ids": ids[:2] + [other_id, 0]}, headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    assert response.json()["deleted_ids"] == ids[:2]
+    assert response.json()["missing_ids"] == sorted([other_id, 0])
+    assert [patient["id"] for patient in client.get("/api/patients", headers=auth_headers).json()] == ids[2:]
+    assert client.get(f"/api/patients/{other_id}", headers=other_headers).status_code == 200
@@ -0,0 +1,55 @@
+"""
+Compact binary name ciphertexts
+"""
+
+import base64
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from encryption import (
+    NONCE_SIZE, check_key_version, decrypt_bytes, decrypt_with_keyring, derive_aes_key,
+    encrypt_bytes, encrypt_with_key, generate_key_from_password
+)
+
+MASTER_KEY, _ = generate_key_from_password("test-password", b"0123456789abcdef")
+
+
+def test_round_trip():
+    ciphertext = encrypt_bytes("Naruto Uzumaki")
+
+    assert ciphertext[0] == 1
+    assert len(ciphertext) == 1 + NONCE_SIZE + len("Naruto Uzumaki") + 16
+    assert decrypt_bytes(ciphertext) == "Naruto Uzumaki"
+
+
+def test_empty_name_is_empty_ciphertext():
+    assert encrypt_bytes("") == b""
+    assert decrypt_bytes(b"") == ""
+
+
+def test_keys_differ_per_version_and_from_fernet_key():
+    v1, v2 = derive_aes_key(MASTER_KEY, 1), derive_aes_key(MASTER_KEY, 2)
+    ciphertext = encrypt_with_key("name", v1, 1)
+
+    assert decrypt_with_keyring(ciphertext, {1: v1}) == "name"
+    with pytest.raises(InvalidTag):
+        decrypt_with_keyring(ciphertext, {1: v2})
+
+    fernet_secret = base64.urlsafe_b64decode(MASTER_KEY)
+    with pytest.raises(InvalidTag):
+        decrypt_with_keyring(ciphertext, {1: AESGCM(fernet_secret)})
+
+
+def test_tampered_ciphertext_is_rejected():
+    ciphertext = bytearray(encrypt_bytes("Naruto Uzumaki"))
+    ciphertext[-1] ^= 1
+
+    assert decrypt_bytes(bytes(ciphertext)) == "[ENCRYPTED]"
+
+
+@pytest.mark.parametrize("version", [0, 256, -1])
+def test_key_version_must_fit_one_byte(version):
+    with pytest.raises(ValueError):
+        check_key_version(version)
@@ -0,0 +1,72 @@
+"""
+ETags and conditional GET on patient resources
+"""
+
+from datetime import datetime
+
+from etag import collection_etag, etag_matches, patient_etag
+
+
+def test_patient_etag_changes_with_version():
+    assert patient_etag(7, 1) == 'W/"p7.1"'
+    assert patient_etag(7, 1) != patient_etag(7, 2)
+
+
+def test_collection_etag_covers_count_timestamp_and_versions():
+    stamp = datetime(2024, 1, 1, 12, 0, 0)
+    etag = collection_etag(3, 10, stamp, 12)
+
+    assert etag.startswith('W/"d3.')
+    assert collection_etag(3, 11, stamp, 12) != etag
+    assert collection_etag(3, 10, datetime(2024, 1, 1, 12, 0, 1), 12) != etag
+    assert collection_etag(3, 10, stamp, 13) != etag
+    assert collection_etag(3, 0, None, 0).startswith('W/"d3.')
+
+
+def test_etag_matches():
+    etag = 'W/"p7.2"'
+
+    assert etag_matches('W/"p7.2"', etag)
+    # Weak comparison ignores the W/ prefix
+    assert etag_matches('"p7.2"', etag)
+    assert etag_matches('"p1.1", W/"p7.2"', etag)
+    assert etag_matches("*", etag)
+
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+    assert not etag_matches('W/"p7.1"', etag)
+
+
+def test_patient_not_modified_until_updated(client, auth_headers, create_patients):
+    patient_id, = create_patients(1)
+    url = f"/api/patients/{patient_id}"
+
+    response = client.get(url, headers=auth_headers)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+
+    response = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+
+    client.put(url, json={"age": 61}, headers=auth_headers)
+    response = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["age"] == 61
+
+
+def test_collection_etag_changes_on_create_and_delete(client, auth_headers, create_patients):
+    patient_id, = create_patients(1)
+    etag = client.get("/api/patients", headers=auth_headers).headers["ETag"]
+
+    create_patients(1)
+    after_create = client.get("/api/patients", headers={**auth_headers, "If-None-Match": etag})
+    assert after_create.status_code == 200
+    assert len(after_create.json()) == 2
+
+    client.delete(f"/api/patients/{patient_id}", headers=auth_headers)
+    after_delete = client.get("/api/patients", headers={**auth_headers, "If-None-Match": after_create.headers["ETag"]})
+    assert after_delete.status_code == 200
+    assert len(after_delete.json()) == 1
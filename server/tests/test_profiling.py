@@ -0,0 +1,45 @@
+"""
+Request profiling triggers and profile retention
+"""
+
+import os
+
+import pytest
+
+from config import settings
+from profiling import ProfilingMiddleware, prune_profiles
+from security import create_access_token
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(settings, "PROFILE_EVERY_N", 0)
+    return tmp_path
+
+
+def scope(*headers):
+    return {"type": "http", "method": "GET", "path": "/api/patients", "headers": list(headers)}
+
+
+def test_profile_header_needs_valid_token(profile_dir):
+    middleware = ProfilingMiddleware(app=None)
+    token = create_access_token({"sub": "dr_profiler"})
+
+    assert middleware._should_profile(scope((b"x-profile", b"1"), (b"authorization", f"Bearer {token}".encode())))
+    assert not middleware._should_profile(scope((b"x-profile", b"1")))
+    assert not middleware._should_profile(scope((b"x-profile", b"1"), (b"authorization", b"Bearer forged")))
+    assert not middleware._should_profile(scope((b"authorization", f"Bearer {token}".encode())))
+
+
+def test_prune_keeps_newest_profiles(profile_dir):
+    for i in range(5):
+        path = profile_dir / f"profile-{i}.collapsed"
+        path.write_text("main 1\n")
+        os.utime(path, (i, i))
+    (profile_dir / "notes.txt").write_text("kept")
+
+    prune_profiles(2)
+
+    assert sorted(os.listdir(profile_dir)) == ["notes.txt", "profile-3.collapsed", "profile-4.collapsed"]
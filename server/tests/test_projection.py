@@ -0,0 +1,68 @@
+"""
+Sparse fieldsets (``?fields=``) on patient reads
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from projection import PATIENT_FIELDS, parse_fields, projected_etag, serialize_patient
+
+
+def test_parse_fields_defaults_to_all():
+    assert parse_fields(None) == PATIENT_FIELDS
+    assert parse_fields("") == PATIENT_FIELDS
+
+
+def test_parse_fields_adds_id_and_keeps_response_order():
+    assert parse_fields("prediction_confidence, lung_cancer") == ["id", "lung_cancer", "prediction_confidence"]
+    assert parse_fields("age,id,age") == ["id", "age"]
+
+
+def test_parse_fields_rejects_unknown():
+    with pytest.raises(ValueError, match="name_ciphertext"):
+        parse_fields("id,name_ciphertext")
+
+
+def test_serialize_patient_only_requested_fields():
+    row = SimpleNamespace(id=1, age=60, lung_cancer=True, updated_at=None, smoking=False)
+
+    assert serialize_patient(row, ["id", "lung_cancer", "updated_at"]) == {
+        "id": 1, "lung_cancer": True, "updated_at": None
+    }
+
+
+def test_projected_etag():
+    etag = 'W/"p1.3"'
+
+    assert projected_etag(etag, PATIENT_FIELDS) == etag
+    narrow = projected_etag(etag, ["id", "lung_cancer"])
+    assert narrow.startswith('W/"p1.3.f') and narrow.endswith('"')
+    assert projected_etag(etag, ["id", "age"]) != narrow
+
+
+def test_list_patients_with_fields(client, auth_headers, create_patients):
+    create_patients(2)
+
+    response = client.get("/api/patients?fields=lung_cancer,prediction_confidence", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert [set(patient) for patient in response.json()] == [{"id", "lung_cancer", "prediction_confidence"}] * 2
+
+
+def test_get_patient_with_fields(client, auth_headers, create_patients):
+    patient_id, = create_patients(1)
+    full = client.get(f"/api/patients/{patient_id}", headers=auth_headers)
+
+    response = client.get(f"/api/patients/{patient_id}?fields=name,age", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"id": patient_id, "name": "Naruto Uzumaki", "age": 60}
+    assert response.headers["ETag"] != full.headers["ETag"]
+
+
+def test_unknown_field_is_rejected(client, auth_headers, create_patients):
+    patient_id, = create_patients(1)
+
+    assert client.get("/api/patients?fields=password", headers=auth_headers).status_code == 400
+    assert client.get(f"/api/patients/{patient_id}?fields=password", headers=auth_headers).status_code == 400
@@ -0,0 +1,65 @@
+"""
+Pin the number of SQL statements per request, so N+1 patterns fail loudly
+"""
+
+import pytest
+
+from conftest import make_patient
+from db.instrumentation import assert_max_queries
+
+
+@pytest.mark.parametrize("patients", [1, 10])
+def test_list_patients_query_count_is_constant(client, auth_headers, create_patients, patients):
+    create_patients(patients)
+
+    # Doctor lookup, collection ETag, patient rows
+    with assert_max_queries(3):
+        response = client.get("/api/patients", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert len(response.json()) == patients
+
+
+def test_list_patients_not_modified_skips_rows(client, auth_headers, create_patients):
+    create_patients(5)
+    etag = client.get("/api/patients", headers=auth_headers).headers["ETag"]
+
+    # Doctor lookup and collection ETag only
+    with assert_max_queries(2):
+        response = client.get("/api/patients", headers={**auth_headers, "If-None-Match": etag})
+
+    assert response.status_code == 304
+
+
+def test_update_patient_query_count(client, auth_headers, create_patients):
+    patient_id, = create_patients(1)
+
+    # Doctor lookup, UPDATE ... RETURNING, prediction write-back
+    with assert_max_queries(3):
+        response = client.put(f"/api/patients/{patient_id}", json={"smoking": True}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["smoking"] is True
+
+
+def test_update_patient_with_all_features_scores_up_front(client, auth_headers, create_patients):
+    patient_id, = create_patients(1)
+    changes = make_patient(smoking=True, coughing=True)
+    del changes["name"]
+
+    # Doctor lookup and one UPDATE ... RETURNING that already carries the prediction
+    with assert_max_queries(2):
+        response = client.put(f"/api/patients/{patient_id}", json=changes, headers=auth_headers)
+
+    assert response.status_code == 200
+
+
+def test_empty_update_keeps_version(client, auth_headers, create_patients):
+    patient_id, = create_patients(1)
+    etag = client.get(f"/api/patients/{patient_id}", headers=auth_headers).headers["ETag"]
+
+    response = client.put(f"/api/patients/{patient_id}", json={}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert client.get(f"/api/patients/{patient_id}", headers=auth_headers).headers["ETag"] == etag
+
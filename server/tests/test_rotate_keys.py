@@ -0,0 +1,128 @@
+"""
+Re-encryption of patient names during key rotation
+"""
+
+import base64
+import os
+
+import pytest
+from cryptography.fernet import Fernet
+from sqlalchemy import select
+
+import rotate_keys
+from config import settings
+from db.database import Engine
+from db.models import PatientData
+from encryption import (
+    decrypt_with_keyring, derive_aes_key, encrypt_bytes, encrypt_text, encrypt_with_key, generate_key_from_password
+)
+
+OLD_KEY, _ = generate_key_from_password("old-password", b"old-salt-0123456")
+NEW_KEY, _ = generate_key_from_password("new-password", b"new-salt-0123456")
+
+
+@pytest.fixture(autouse=True)
+def worker():
+    """Set up the worker keys in this process: version 1 is old, version 2 current"""
+    rotate_keys.init_worker({1: OLD_KEY, 2: NEW_KEY}, 2)
+
+
+def current_keyring():
+    return {2: derive_aes_key(NEW_KEY, 2)}
+
+
+def test_old_key_version_is_reencrypted():
+    old = encrypt_with_key("Naruto Uzumaki", derive_aes_key(OLD_KEY, 1), 1)
+
+    updates, already_current, failed = rotate_keys.reencrypt_chunk([(1, None, old)])
+
+    assert (already_current, failed) == (0, [])
+    update, = updates
+    assert update["row_id"] == 1 and update["old_ciphertext"] == old
+    assert update["ciphertext"][0] == 2
+    assert decrypt_with_keyring(update["ciphertext"], current_keyring()) == "Naruto Uzumaki"
+
+
+def test_current_key_version_is_skipped():
+    current = encrypt_with_key("Naruto Uzumaki", derive_aes_key(NEW_KEY, 2), 2)
+
+    assert rotate_keys.reencrypt_chunk([(1, None, current)]) == ([], 1, [])
+
+
+def test_empty_name_is_skipped():
+    assert rotate_keys.reencrypt_chunk([(2, None, b"")]) == ([], 1, [])
+
+
+def test_legacy_name_is_converted():
+    legacy = base64.b64encode(Fernet(OLD_KEY).encrypt(b"Sakura Haruno")).decode()
+
+    updates, already_current, failed = rotate_keys.reencrypt_chunk([(3, legacy, None)])
+
+    assert (already_current, failed) == (0, [])
+    assert updates[0]["old_encrypted"] == legacy
+    assert decrypt_with_keyring(updates[0]["ciphertext"], current_keyring()) == "Sakura Haruno"
+
+
+def test_undecryptable_rows_are_reported():
+    unknown_key = encrypt_with_key("x", derive_aes_key(NEW_KEY, 3), 3)
+    rows = [(4, "not base64!", None), (5, None, unknown_key), (6, None, None), (7, None, b"")]
+
+    updates, already_current, failed = rotate_keys.reencrypt_chunk(rows)
+
+    assert updates == []
+    assert already_current == 1
+    assert failed == [4, 5, 6]
+
+
+def test_write_updates_skips_names_changed_meanwhile(client, auth_headers, create_patients):
+    patient_id, = create_patients(1)
+    table = PatientData.__table__
+    with Engine.connect() as conn:
+        stored = conn.execute(select(table.c.name_ciphertext).where(table.c.id == patient_id)).scalar()
+
+    update = {"row_id": patient_id, "old_encrypted": None, "ciphertext": encrypt_bytes("Kakashi Hatake")}
+    with Engine.begin() as conn:
+        assert rotate_keys.write_updates(conn, [{**update, "old_ciphertext": b"\x01stale"}]) == 0
+        assert rotate_keys.write_updates(conn, [{**update, "old_ciphertext": stored}]) == 1
+
+
+def test_legacy_names_are_converted_and_checkpoint_removed(client, auth_headers, create_patients, tmp_path):
+    patient_id, = create_patients(1, name="Hinata Hyuga")
+    table = PatientData.__table__
+    with Engine.begin() as conn:
+        conn.execute(
+            table.update().where(table.c.id == patient_id)
+            .values(name_encrypted=encrypt_text("Hinata Hyuga"), name_ciphertext=None)
+        )
+    checkpoint_path = str(tmp_path / "rotate.checkpoint.json")
+
+    checkpoint = rotate_keys.rotate_keys(None, None, None, 100, 1, checkpoint_path)
+
+    assert checkpoint["rotated"] >= 1 and checkpoint["failed"] == 0
+    assert not os.path.exists(checkpoint_path)
+    assert client.get(f"/api/patients/{patient_id}", headers=auth_headers).json()["name"] == "Hinata Hyuga"
+
+
+def test_checkpoint_of_another_key_version_is_ignored(client, auth_headers, create_patients, tmp_path):
+    create_patients(1)
+    checkpoint_path = str(tmp_path / "rotate.checkpoint.json")
+    stale = {"key_version": 99, "last_id": 10 ** 9, "rotated": 0, "already_current": 0, "changed": 0, "failed": 0}
+    rotate_keys.save_checkpoint(checkpoint_path, stale)
+
+    checkpoint = rotate_keys.rotate_keys(None, None, None, 100, 1, checkpoint_path)
+
+    assert checkpoint["already_current"] >= 1
+
+
+def test_interrupted_run_resumes(tmp_path):
+    checkpoint_path = str(tmp_path / "rotate.checkpoint.json")
+    interrupted = {
+        "key_version": settings.ENCRYPTION_KEY_VERSION, "last_id": 10 ** 9,
+        "rotated": 7, "already_current": 0, "changed": 0, "failed": 0
+    }
+    rotate_keys.save_checkpoint(checkpoint_path, interrupted)
+
+    checkpoint = rotate_keys.rotate_keys(None, None, None, 100, 1, checkpoint_path)
+
+    assert checkpoint["rotated"] == 7 and checkpoint["already_current"] == 0
+    assert not os.path.exists(checkpoint_path)
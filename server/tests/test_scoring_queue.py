@@ -0,0 +1,128 @@
+"""
+Deferred scoring: claiming stale rows, version guard and failures
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+import scoring_queue
+from db.database import Engine
+from db.models import PatientData
+from scoring_queue import DONE, FAILED, PENDING, DeferredScorer
+
+TABLE = PatientData.__table__
+
+
+def set_row(patient_id: int, **values):
+    with Engine.begin() as conn:
+        conn.execute(TABLE.update().where(TABLE.c.id == patient_id).values(**values))
+
+
+def get_row(patient_id: int):
+    with Engine.connect() as conn:
+        return conn.execute(select(TABLE).where(TABLE.c.id == patient_id)).one()
+
+
+def queued_ids(scorer: DeferredScorer) -> list[int]:
+    return [item[0] for item in scorer._queue.queue if item is not None]
+
+
+@pytest.fixture
+def scorer():
+    return DeferredScorer(workers=1, batch_size=8, max_wait_ms=10, lease_seconds=60)
+
+
+def test_recovery_claims_only_rows_past_their_lease(create_patients, scorer):
+    stale, fresh, failed, done = create_patients(4)
+    long_ago = datetime.utcnow() - timedelta(minutes=5)
+    set_row(stale, prediction_status=PENDING, lung_cancer=None, updated_at=long_ago)
+    set_row(fresh, prediction_status=PENDING, lung_cancer=None)
+    set_row(failed, prediction_status=FAILED, updated_at=long_ago)
+    version = get_row(stale).version
+
+    scorer.recover_pending()
+
+    assert stale in queued_ids(scorer) and failed in queued_ids(scorer)
+    assert fresh not in queued_ids(scorer) and done not in queued_ids(scorer)
+    # The claim bumps the version and refreshes the lease
+    claimed = get_row(stale)
+    assert claimed.version == version + 1
+    assert claimed.updated_at > long_ago
+    assert get_row(failed).prediction_status == PENDING
+
+    # A second claim within the lease finds nothing new
+    other = DeferredScorer(lease_seconds=60)
+    other.recover_pending()
+    assert stale not in queued_ids(other)
+
+
+def test_score_writes_prediction(create_patients, scorer):
+    patient_id, = create_patients(1)
+    set_row(patient_id, prediction_status=PENDING, lung_cancer=None, prediction_confidence=None)
+    row = get_row(patient_id)
+
+    scorer.enqueue(patient_id, row.version, dict(row._mapping))
+    scorer._score(scorer._next_batch()[0])
+
+    scored = get_row(patient_id)
+    assert scored.prediction_status == DONE
+    assert scored.lung_cancer is not None and scored.prediction_confidence is not None
+    assert scored.version == row.version + 1
+    assert scorer.completed_batches == 1
+
+
+def test_score_skips_rows_changed_since_queued(create_patients, scorer):
+    patient_id, = create_patients(1)
+    set_row(patient_id, prediction_status=PENDING, lung_cancer=None)
+    row = get_row(patient_id)
+
+    scorer.enqueue(patient_id, row.version, dict(row._mapping))
+    set_row(patient_id, version=row.version + 1)
+    scorer._score(scorer._next_batch()[0])
+
+    assert get_row(patient_id).prediction_status == PENDING
+
+
+def test_scoring_error_marks_rows_failed(create_patients, scorer, monkeypatch):
+    def failing(rows):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(scoring_queue, "predict_batch", failing)
+    patient_id, = create_patients(1)
+    set_row(patient_id, prediction_status=PENDING, lung_cancer=None)
+    row = get_row(patient_id)
+
+    scorer.enqueue(patient_id, row.version, dict(row._mapping))
+    scorer._score(scorer._next_batch()[0])
+
+    assert get_row(patient_id).prediction_status == FAILED
+
+
+def test_workers_drain_the_queue(create_patients, scorer):
+    ids = create_patients(3)
+    for patient_id in ids:
+        set_row(patient_id, prediction_status=PENDING, lung_cancer=None)
+
+    scorer.start()
+    for patient_id in ids:
+        row = get_row(patient_id)
+        scorer.enqueue(patient_id, row.version, dict(row._mapping))
+    scorer.stop()
+
+    assert [get_row(patient_id).prediction_status for patient_id in ids] == [DONE] * 3
+
+
+def test_prediction_long_poll(client, auth_headers, create_patients):
+    patient_id, = create_patients(1)
+    url = f"/api/patients/{patient_id}/prediction"
+
+    assert client.get(url, headers=auth_headers).json()["prediction_status"] == DONE
+
+    set_row(patient_id, prediction_status=PENDING, lung_cancer=None)
+    response = client.get(f"{url}?wait=0.2", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["prediction_status"] == PENDING
+
+    assert client.get("/api/patients/0/prediction", headers=auth_headers).status_code == 404
@@ -0,0 +1,17 @@
+"""
+Worker warmup and readiness
+"""
+
+from ml.predict import monitor, predict_batch
+from warmup import WARMUP_PATIENT, is_ready, warmup
+
+
+def test_warmup_keeps_served_predictions_in_the_monitor(client):
+    predict_batch([WARMUP_PATIENT])
+    served = monitor.live.count
+
+    warmup()
+
+    assert is_ready()
+    assert monitor.live.count == served
+    assert client.get("/ready").status_code == 200
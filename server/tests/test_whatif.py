@@ -0,0 +1,30 @@
+"""
+What-if request validation
+"""
+
+import pytest
+
+
+def test_scenarios_are_scored(client, auth_headers, create_patients):
+    patient_id, = create_patients(1)
+    request = {"toggles": False, "ages": [50], "scenarios": [{"name": "older", "changes": {"age": 80}}]}
+
+    response = client.post(f"/api/patients/{patient_id}/whatif", json=request, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert {result["scenario"] for result in response.json()["scenarios"]} >= {"older"}
+
+
+@pytest.mark.parametrize("request_body", [
+    {"ages": [121]},
+    {"ages": [-1]},
+    {"ages": list(range(51))},
+    {"scenarios": [{"changes": {"age": 500}}]},
+    {"scenarios": [{"changes": {"age": -5}}]},
+])
+def test_ages_are_bounded(client, auth_headers, create_patients, request_body):
+    patient_id, = create_patients(1)
+
+    response = client.post(f"/api/patients/{patient_id}/whatif", json=request_body, headers=auth_headers)
+
+    assert response.status_code == 422